@@ -0,0 +1,230 @@
+"""离线压测：用 WechatAPIClient 替身和本地假接口驱动完整插件，回放合成消息流.
+
+消息流按比例混合普通聊天、点歌、播放与管理指令（切换卡片/切换列表/音乐统计），
+报告吞吐量、各类消息的处理耗时分位数以及内存增长。
+
+用法：python benchmarks/bench_load.py [--messages 2000] [--rate 200] [--profile normal]
+      [--mix chatter=70,song=15,play=10,admin=5] [--list] [--no-limits] [--tracemalloc]
+
+--rate 为每秒注入的消息数（开环，模拟真实流量）；--rate 0 时改为 --concurrency 个
+协程连续处理（闭环，测最大吞吐）。
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tomllib
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+import tomli_w
+
+from common import PLUGIN_ROOT, load_plugin_package, summarize
+from fakes import PROFILES, FakeMusicApi, StubBot, install_framework_stubs
+
+ADMIN_WXID = "wxid_bench_admin"
+CHATTER = ["哈哈哈", "今天吃什么", "点个赞", "播放器又卡了", "音乐节有人去吗", "[表情]", "收到", "在吗？"]
+ADMIN_COMMANDS = ["切换卡片", "切换列表", "音乐统计"]
+
+
+def prepare_workdir(api_url: str, args) -> Path:
+    """在临时目录中按机器人的目录结构放置配置文件，插件按相对路径读取."""
+    workdir = Path(tempfile.mkdtemp(prefix="music_puls_bench."))
+    with open(PLUGIN_ROOT / "config.toml", "rb") as f:
+        config = tomllib.load(f)
+    section = config["Music_puls"]
+    section["api_url"] = api_url
+    section["fallback_api_urls"] = []
+    section.setdefault("log", {})["enabled"] = args.log
+    section.setdefault("features", {})["fetch_song_list"] = args.list
+    section.setdefault("limits", {})["enabled"] = not args.no_limits
+    section.setdefault("persist", {})["enabled"] = False
+    section.setdefault("reload", {})["watch"] = False
+    section.setdefault("metrics", {})["dump_path"] = ""
+    plugin_dir = workdir / "plugins" / "Music_puls"
+    plugin_dir.mkdir(parents=True)
+    with open(plugin_dir / "config.toml", "wb") as f:
+        tomli_w.dump(config, f)
+    with open(workdir / "main_config.toml", "wb") as f:
+        tomli_w.dump({"XYBot": {"admins": [ADMIN_WXID]}}, f)
+    return workdir
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        mix[kind.strip()] = float(weight)
+    unknown = set(mix) - {"chatter", "song", "play", "admin"}
+    if unknown:
+        raise SystemExit(f"未知的消息类型: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def synthetic_messages(args, seed: int = 0) -> list:
+    """生成 (类型, 消息) 列表：歌名按长尾分布抽取，使缓存命中率接近真实流量."""
+    rng = random.Random(seed)
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    titles = [f"歌曲{i}" for i in range(args.titles)]
+    title_weights = [1 / (i + 1) for i in range(args.titles)]
+    messages = []
+    for _ in range(args.messages):
+        kind = rng.choices(kinds, weights)[0]
+        sender = f"wxid_user{rng.randrange(args.users)}"
+        if kind == "chatter":
+            content = rng.choice(CHATTER)
+        elif kind == "song":
+            content = f"点歌 {rng.choices(titles, title_weights)[0]}"
+        elif kind == "play":
+            content = f"播放 {rng.randint(1, 10)}"
+        else:
+            sender = ADMIN_WXID
+            content = rng.choice(ADMIN_COMMANDS)
+        message = {
+            "Content": content,
+            "SenderWxid": sender,
+            "FromWxid": f"{rng.randrange(args.chats)}@chatroom",
+        }
+        messages.append((kind, message))
+    return messages
+
+
+def rss_kb() -> int:
+    """当前常驻内存（KB），不支持 /proc 的平台返回峰值."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def replay(plugin, bot, messages: list, rate: float, concurrency: int) -> dict:
+    latencies = defaultdict(list)
+
+    async def handle(kind: str, message: dict):
+        start = time.perf_counter()
+        try:
+            await plugin.handle_text(bot, message)
+        except Exception as e:
+            latencies["error"].append(time.perf_counter() - start)
+            print(f"处理异常: {e!r}", file=sys.stderr)
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    if rate > 0:
+        # 开环：按固定速率注入，不等待前一条处理完成
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = []
+        for i, (kind, message) in enumerate(messages):
+            delay = started + i / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(handle(kind, message)))
+        await asyncio.gather(*tasks)
+    else:
+        queue = iter(messages)
+
+        async def worker():
+            for kind, message in queue:
+                await handle(kind, message)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def run(args):
+    install_framework_stubs()
+    load_plugin_package()
+    from Music_puls.main import Music_puls
+    from Music_puls.plugin_log import log
+
+    api = FakeMusicApi(PROFILES[args.profile], args.seed)
+    api_url = await api.start()
+    workdir = prepare_workdir(api_url, args)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        plugin = Music_puls()
+        log.configure(enabled=args.log, level="INFO")
+        await plugin.on_enable(None)
+        await plugin.async_init()
+        bot = StubBot(send_latency=args.send_latency)
+        messages = synthetic_messages(args, args.seed)
+
+        gc.collect()
+        if args.tracemalloc:
+            tracemalloc.start()
+        rss_before = rss_kb()
+        started = time.perf_counter()
+        latencies = await replay(plugin, bot, messages, args.rate, args.concurrency)
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*plugin._background_tasks, return_exceptions=True)
+        gc.collect()
+        rss_after = rss_kb()
+        traced = tracemalloc.get_traced_memory() if args.tracemalloc else None
+        tracemalloc.stop()
+        stats = plugin.stats()
+        pending_at_end = len(plugin.outbox)
+        # 卸载时发送队列会等待 drain_timeout 秒，之后仍未发送的消息被丢弃
+        await plugin.on_disable()
+        sender = plugin.outbox.stats()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        await api.stop()
+
+    mode = f"开环 {args.rate:g} 条/秒" if args.rate > 0 else f"闭环 {args.concurrency} 并发"
+    print(f"接口配置: {args.profile} | 消息数: {len(messages)} | 模式: {mode} | "
+          f"列表模式: {args.list} | 限流: {not args.no_limits}")
+    print(f"耗时: {elapsed:.2f}s | 吞吐量: {len(messages) / elapsed:.1f} 条/秒")
+    for kind in ("chatter", "song", "play", "admin", "error"):
+        if latencies.get(kind):
+            print(f"  {kind:<8} n={len(latencies[kind]):<6} {summarize(latencies[kind], 'ms')}")
+    print(f"上游请求: {api.requests} | 上游注入错误: {api.errors} | "
+          f"插件上游调用: {stats['upstream']['calls']} | 重试: {stats['upstream']['retries']} | "
+          f"失败: {stats['upstream']['failures']}")
+    cache = stats["cache"]
+    print(f"缓存命中率: {cache['hit_ratio']:.1%} | 条目: {cache['size']} | 请求合并: {stats['inflight']['shared']} | "
+          f"限流拒绝: {stats['rate_limited']}")
+    print(f"发送: 卡片 {bot.sent['app']} | @消息 {bot.sent['at']} | 文本 {bot.sent['text']} | "
+          f"共 {bot.sent_bytes / 1024:.1f}KB")
+    print(f"发送队列: 回放结束时排队 {pending_at_end} | 重试 {sender['retries']} | "
+          f"失败 {sender['failures']} | 卸载时丢弃 {sender['dropped']}")
+    print(f"内存: RSS {rss_before / 1024:.1f}MB → {rss_after / 1024:.1f}MB "
+          f"(+{(rss_after - rss_before) / 1024:.1f}MB)")
+    if traced is not None:
+        print(f"      tracemalloc 当前 {traced[0] / 1024:.1f}KB | 峰值 {traced[1] / 1024:.1f}KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200, help="每秒注入的消息数，0=闭环")
+    parser.add_argument("--concurrency", type=int, default=50, help="闭环模式下的并发协程数")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="normal")
+    parser.add_argument("--mix", default="chatter=70,song=15,play=10,admin=5")
+    parser.add_argument("--titles", type=int, default=500, help="不同歌名的数量")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--send-latency", type=float, default=0.0, help="模拟每次发送消息的耗时（秒）")
+    parser.add_argument("--list", action="store_true", help="开启列表模式（点歌返回列表，播放 序号 获取卡片）")
+    parser.add_argument("--no-limits", action="store_true", help="关闭按用户/会话限流")
+    parser.add_argument("--log", action="store_true", help="输出插件日志")
+    parser.add_argument("--tracemalloc", action="store_true", help="用 tracemalloc 统计 Python 内存分配（会变慢）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
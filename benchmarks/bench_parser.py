@@ -0,0 +1,81 @@
+"""歌曲列表解析基准：对比旧版逐行 import re 的解析与预编译单次遍历解析.
+
+用法：python benchmarks/bench_parser.py [--lines 5000] [--rounds 20] [--max-results 30]
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+
+from common import load_plugin_package, summarize
+
+load_plugin_package()
+from Music_puls.parser import parse_song_list, parse_song_list_stream  # noqa: E402
+
+TITLES = ["晴天", "Re-Born", "七里香", "稻香", "Love Story (Taylor's Version)", "夜曲", "A-Lin 精选"]
+SINGERS = ["周杰伦", "X", "A-Lin", "Taylor Swift", "五月天"]
+SEPARATORS = ["--", " - ", "|", "-"]
+
+
+def synthetic_response(lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    rows = ["请选择歌曲："]
+    for i in range(1, lines + 1):
+        rows.append(f"{i}{rng.choice(['.', '、'])}{rng.choice(TITLES)}"
+                    f"{rng.choice(SEPARATORS)}{rng.choice(SINGERS)}")
+    rows.append("")
+    return "\n".join(rows)
+
+
+def legacy_parse(text: str) -> list:
+    """旧版解析逻辑（去掉日志），作为对照组."""
+    song_list = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        import re as _re
+        parts = _re.split(r'[\-|]+', line, maxsplit=1)
+        if len(parts) == 2:
+            num_title, singer = parts
+            num_title_parts = _re.split(r'[、.]', num_title, maxsplit=1)
+            if len(num_title_parts) == 2:
+                num, title = num_title_parts
+                song_list.append({"num": num.strip(), "title": title.strip(), "singer": singer.strip()})
+    return song_list
+
+
+async def _lines(data: bytes):
+    for line in data.splitlines(keepends=True):
+        yield line
+
+
+def timed(func, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-results", type=int, default=30)
+    args = parser.parse_args()
+
+    text = synthetic_response(args.lines)
+    data = text.encode("utf-8")
+    re.purge()
+    print(f"响应行数: {args.lines} | 响应大小: {len(data)} 字节 | 轮数: {args.rounds}")
+    print(f"旧版解析        {summarize(timed(lambda: legacy_parse(text), args.rounds))}")
+    print(f"预编译解析      {summarize(timed(lambda: parse_song_list(text), args.rounds))}")
+    print(f"预编译+数量上限 {summarize(timed(lambda: parse_song_list(text, args.max_results), args.rounds))}")
+    stream = timed(lambda: asyncio.run(parse_song_list_stream(_lines(data), args.max_results)), args.rounds)
+    print(f"流式+数量上限   {summarize(stream)}")
+
+
+if __name__ == "__main__":
+    main()
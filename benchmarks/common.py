@@ -0,0 +1,39 @@
+"""基准测试公共工具：在不依赖机器人框架目录结构的情况下加载插件包."""
+import importlib.util
+import statistics
+import sys
+from pathlib import Path
+
+PLUGIN_ROOT = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "Music_puls"
+
+
+def load_plugin_package():
+    """以 Music_puls 包名加载插件目录，使插件内的相对导入可用."""
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, PLUGIN_ROOT / "__init__.py", submodule_search_locations=[str(PLUGIN_ROOT)]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+UNITS = {"us": 1e6, "ms": 1e3, "s": 1.0}
+
+
+def summarize(samples: list, unit: str = "us") -> str:
+    """格式化耗时样本（秒）为 均值/p50/p95/p99（默认微秒）."""
+    scaled = [s * UNITS[unit] for s in samples]
+    return (f"mean={statistics.fmean(scaled):.1f}{unit} p50={percentile(scaled, 50):.1f}{unit} "
+            f"p95={percentile(scaled, 95):.1f}{unit} p99={percentile(scaled, 99):.1f}{unit}")
@@ -0,0 +1,158 @@
+"""离线压测用的替身：机器人框架模块、WechatAPIClient 与本地 dgMusic_kugou 假接口.
+
+只在基准测试进程中使用，插件本身不依赖本模块。
+"""
+import asyncio
+import importlib.util
+import json
+import random
+import sys
+import types
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+def install_framework_stubs():
+    """框架模块（WechatAPI、utils）不可导入时，注入最小替身使插件可以脱离机器人加载."""
+    if importlib.util.find_spec("WechatAPI") is None:
+        wechat_api = types.ModuleType("WechatAPI")
+        wechat_api.WechatAPIClient = StubBot
+        sys.modules["WechatAPI"] = wechat_api
+    if importlib.util.find_spec("utils") is not None:
+        return
+    utils = types.ModuleType("utils")
+    utils.__path__ = []
+    plugin_base = types.ModuleType("utils.plugin_base")
+    decorators = types.ModuleType("utils.decorators")
+
+    class PluginBase:
+        description = ""
+        author = ""
+        version = ""
+
+        def __init__(self):
+            self.enabled = False
+
+        async def on_enable(self, bot=None):
+            self.enabled = True
+
+        async def on_disable(self):
+            self.enabled = False
+
+        async def async_init(self):
+            pass
+
+    def on_text_message(func):
+        return func
+
+    def schedule(trigger, **kwargs):
+        def decorator(func):
+            func._schedule = (trigger, kwargs)
+            return func
+        return decorator
+
+    plugin_base.PluginBase = PluginBase
+    decorators.on_text_message = on_text_message
+    decorators.schedule = schedule
+    decorators.__all__ = ["on_text_message", "schedule"]
+    utils.plugin_base = plugin_base
+    utils.decorators = decorators
+    sys.modules.update({"utils": utils, "utils.plugin_base": plugin_base, "utils.decorators": decorators})
+
+
+class StubBot:
+    """WechatAPIClient 替身：记录发送次数与字节数，可模拟发送耗时."""
+
+    def __init__(self, wxid: str = "wxid_bench_bot", send_latency: float = 0.0):
+        self.wxid = wxid
+        self.send_latency = send_latency
+        self.sent = {"text": 0, "at": 0, "app": 0}
+        self.sent_bytes = 0
+
+    async def _send(self, kind: str, content: str):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent[kind] += 1
+        self.sent_bytes += len(content.encode("utf-8"))
+
+    async def send_text_message(self, wxid: str, content: str, at=""):
+        await self._send("text", content)
+
+    async def send_at_message(self, wxid: str, content: str, at: list):
+        await self._send("at", content)
+
+    async def send_app_message(self, wxid: str, xml: str, type_: int):
+        await self._send("app", xml)
+
+
+@dataclass
+class ApiProfile:
+    """假接口的行为：延迟（均值±抖动，秒）、错误率、列表行数与歌词行数."""
+    latency: float = 0.05
+    jitter: float = 0.02
+    error_rate: float = 0.0
+    list_lines: int = 30
+    lyric_lines: int = 40
+
+
+PROFILES = {
+    "fast": ApiProfile(latency=0.005, jitter=0.002),
+    "normal": ApiProfile(),
+    "slow": ApiProfile(latency=0.4, jitter=0.2),
+    "flaky": ApiProfile(latency=0.08, jitter=0.05, error_rate=0.2),
+    "large": ApiProfile(latency=0.05, list_lines=500, lyric_lines=400),
+}
+
+
+class FakeMusicApi:
+    """本地 dgMusic_kugou 假接口：type=text 返回编号歌曲列表，type=json 返回歌曲详情."""
+
+    def __init__(self, profile: ApiProfile, seed: int = 0):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._runner = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        profile = self.profile
+        await asyncio.sleep(max(0.0, self.rng.gauss(profile.latency, profile.jitter)))
+        if self.rng.random() < profile.error_rate:
+            self.errors += 1
+            return web.Response(status=self.rng.choice((500, 502, 503)))
+        msg = request.query.get("msg", "")
+        if request.query.get("type") == "text":
+            rows = [f"{i}.{msg}{i}--歌手{i % 17}" for i in range(1, profile.list_lines + 1)]
+            return web.Response(text="\n".join(rows))
+        n = request.query.get("n", "1")
+        lyrics = "\n".join(f"[00:{i % 60:02d}.00]{msg} 第{i}句歌词" for i in range(profile.lyric_lines))
+        data = {
+            "code": 200,
+            "title": f"{msg}#{n}",
+            "singer": f"歌手{n}",
+            "cover": f"https://img.example.com/{n}.jpg",
+            "link": f"https://music.example.com/song/{msg}/{n}",
+            "music_url": f"https://cdn.example.com/{msg}/{n}.mp3?sign={self.rng.getrandbits(32):08x}",
+            "lyrics": lyrics,
+        }
+        # 真实接口的 Content-Type 不规范，插件按 content_type=None 解析
+        return web.Response(text=json.dumps(data, ensure_ascii=False), content_type="text/html")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_get("/api/dgMusic_kugou/", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}/api/dgMusic_kugou/"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
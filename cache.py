@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+def normalize_query(msg: str) -> str:
+    """归一化搜索词：去除首尾空白、合并连续空白并忽略大小写."""
+    return " ".join(str(msg).split()).casefold()
+
+
+def make_key(msg: str, n: Optional[int], type_: str) -> tuple:
+    """生成缓存键 (msg, n, type)."""
+    return normalize_query(msg), n, type_
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存，记录命中/未命中次数."""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 600):
+        self.max_entries = max(1, int(max_entries))
+        self.default_ttl = float(default_ttl)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (过期时间, 值)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，过期或不存在时返回 None."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            # 过期条目暂不删除，上游不可用时仍可通过 get_stale 读取，容量满时按LRU淘汰
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable, max_stale: float) -> Optional[Any]:
+        """读取已过期但过期时间不超过 max_stale 秒的条目（上游故障时的兜底）."""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if time.monotonic() - expires_at > max_stale:
+            return None
+        self.stale_hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目."""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """合并并发的相同请求：同一个键同时只有一个进行中的调用，其余调用方共享其结果."""
+
+    def __init__(self):
+        self._calls: "dict[Hashable, asyncio.Task]" = {}
+        self.calls = 0     # 实际发起的调用次数
+        self.shared = 0    # 复用进行中调用的次数
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.shared += 1
+        # shield：某个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._calls), "calls": self.calls, "shared": self.shared}
+
+
+class SearchRecord:
+    """单个会话的最近一次搜索：只保留搜索词和接口返回的序号，播放时按 (搜索词, 序号) 获取详情.
+
+    解析时跳过的异常行会使列表中的序号与接口序号错位，因此按列表位置换算为接口序号。
+    批量点歌时一次搜索包含多个搜索词，segments 按列表顺序记录每个搜索词及其接口序号，
+    列表序号连续编排。
+    """
+
+    __slots__ = ("segments", "count", "touched_at")
+
+    def __init__(self, segments: tuple, touched_at: float):
+        self.segments = segments
+        self.count = sum(len(nums) for _, nums in segments)
+        self.touched_at = touched_at
+
+    @property
+    def keyword(self) -> str:
+        return self.segments[0][0] if self.segments else ""
+
+    def resolve(self, index: int) -> Optional[tuple]:
+        """把列表中的序号（从1开始）换算为 (搜索词, 接口返回的序号)."""
+        if index < 1:
+            return None
+        for keyword, nums in self.segments:
+            if index <= len(nums):
+                return keyword, nums[index - 1]
+            index -= len(nums)
+        return None
+
+
+class SearchResultStore:
+    """按会话保存搜索记录：容量有上限，空闲超时自动过期，超出容量时淘汰最久未使用的会话."""
+
+    def __init__(self, max_entries: int = 1000, idle_ttl: float = 600):
+        self.max_entries = max(1, int(max_entries))
+        self.idle_ttl = float(idle_ttl)
+        self._data: "OrderedDict[str, SearchRecord]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def put(self, chat_id: str, segments: tuple) -> SearchRecord:
+        """保存会话的搜索记录，segments 为 ((搜索词, (接口序号, ...)), ...)."""
+        now = time.monotonic()
+        record = SearchRecord(tuple(segments), now)
+        self._data[chat_id] = record
+        self._data.move_to_end(chat_id)
+        self._purge(now)
+        return record
+
+    def get(self, chat_id: str) -> Optional[SearchRecord]:
+        """读取会话的搜索记录并刷新空闲计时，已过期时返回 None."""
+        record = self._data.get(chat_id)
+        if record is None:
+            return None
+        now = time.monotonic()
+        if now - record.touched_at > self.idle_ttl:
+            del self._data[chat_id]
+            return None
+        record.touched_at = now
+        self._data.move_to_end(chat_id)
+        return record
+
+    def peek(self, chat_id: str) -> Optional[SearchRecord]:
+        """读取搜索记录但不刷新空闲计时."""
+        record = self._data.get(chat_id)
+        if record is None or time.monotonic() - record.touched_at > self.idle_ttl:
+            return None
+        return record
+
+    def pop(self, chat_id: str):
+        self._data.pop(chat_id, None)
+
+    def _purge(self, now: float):
+        # 条目按最近访问时间排列，从头部清理过期和超出容量的会话
+        while self._data:
+            chat_id, record = next(iter(self._data.items()))
+            if len(self._data) > self.max_entries or now - record.touched_at > self.idle_ttl:
+                del self._data[chat_id]
+            else:
+                break
@@ -0,0 +1,263 @@
+import re
+from typing import Optional
+from xml.sax.saxutils import escape
+
+
+from .cache import TTLCache
+from .plugin_log import log
+
+# 卡片模板中的字段占位符，如 {title}
+_FIELD_PATTERN = re.compile(r"\{(\w+)\}")
+_COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.S)
+_BETWEEN_TAGS_PATTERN = re.compile(r">\s+<")
+# LRC 时间标签（如 [01:23.45]）以及整行的标签信息（如 [ti:晴天]、[offset:0]）
+_LRC_TIMESTAMP_PATTERN = re.compile(r"\[\d{1,3}:\d{1,2}(?:[.:]\d{1,3})?\]")
+_LRC_TAG_LINE_PATTERN = re.compile(r"^\[[a-zA-Z#]+:[^\]]*\]$")
+
+LYRIC_MODES = ("full", "off", "lines", "bytes")
+
+YAOYIYAO_TEMPLATE = """<appmsg appid="wx485a97c844086dc9" sdkver="0">
+    <title>{title}</title>
+    <des>{singer}</des>
+    <action>view</action>
+    <type>3</type>
+    <showtype>0</showtype>
+    <content/>
+    <url>{url}</url>
+    <dataurl>{music_url}</dataurl>
+    <lowurl>{url}</lowurl>
+    <lowdataurl>{music_url}</lowdataurl>
+    <thumburl /> <!-- 改为空标签 -->
+    <songlyric>{lyric}</songlyric>
+    <songalbumurl>{cover_url}</songalbumurl> <!-- 依赖此字段显示图片 -->
+    <appattach> <!-- 恢复简洁结构 -->
+        <totallen>0</totallen>
+        <attachid/>
+        <emoticonmd5/>
+        <fileext/>
+        <aeskey/>
+    </appattach>
+    <weappinfo>
+        <pagepath/>
+        <username/>
+        <appid/>
+        <appservicetype>0</appservicetype>
+    </weappinfo>
+</appmsg>
+<fromusername>{bot_wxid}</fromusername>
+<scene>0</scene>
+<appinfo>
+    <version>29</version>
+    <appname>摇一摇搜歌</appname>
+</appinfo>
+<commenturl/>"""
+
+ORIGINAL_TEMPLATE = """<appmsg appid="wx79f2c4418704b4f8" sdkver="0">
+    <title>{title}</title>
+    <des>{singer}</des>
+    <action>view</action>
+    <type>3</type>
+    <showtype>0</showtype>
+    <content/>
+    <url>{url}</url>
+    <dataurl>{music_url}</dataurl>
+    <lowurl>{url}</lowurl>
+    <lowdataurl>{music_url}</lowdataurl>
+    <recorditem/>
+    <thumburl /> <!-- 改为空标签 -->
+    <messageaction/>
+    <laninfo/>
+    <extinfo/>
+    <sourceusername/>
+    <sourcedisplayname/>
+    <songlyric>{lyric}</songlyric>
+    <commenturl/>
+    <appattach> <!-- 恢复简洁结构 -->
+        <totallen>0</totallen>
+        <attachid/>
+        <emoticonmd5/>
+        <fileext/>
+        <aeskey/>
+    </appattach>
+    <webviewshared>
+        <publisherId/>
+        <publisherReqId>0</publisherReqId>
+    </webviewshared>
+    <weappinfo>
+        <pagepath/>
+        <username/>
+        <appid/>
+        <appservicetype>0</appservicetype>
+    </weappinfo>
+    <websearch/>
+    <songalbumurl>{cover_url}</songalbumurl>
+</appmsg>
+<fromusername>{bot_wxid}</fromusername>
+<scene>0</scene>
+<appinfo>
+    <version>1</version>
+    <appname/>
+</appinfo>
+<commenturl/>"""
+
+DEFAULT_CARD_TYPE = "原卡片"
+
+
+def escape_xml(value) -> str:
+    """转义XML文本中的 &、<、>（同时避免 ]]> 破坏卡片结构）."""
+    return escape(str(value or ""))
+
+
+def minify_xml(template: str) -> str:
+    """去除注释以及标签之间的空白，减小卡片体积."""
+    template = _COMMENT_PATTERN.sub("", template)
+    template = _BETWEEN_TAGS_PATTERN.sub("><", template)
+    return template.strip()
+
+
+def strip_lrc(lyric: str) -> str:
+    """去除 LRC 时间标签和标签信息行，只保留歌词文本."""
+    lines = []
+    for line in lyric.splitlines():
+        line = line.strip()
+        if not line or _LRC_TAG_LINE_PATTERN.match(line):
+            continue
+        line = _LRC_TIMESTAMP_PATTERN.sub("", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def truncate_bytes(text: str, max_bytes: int) -> str:
+    """按 UTF-8 字节数截断文本，不截断多字节字符，尽量在整行处结束."""
+    if max_bytes <= 0:
+        return ""
+    data = text.encode("utf-8")
+    if len(data) <= max_bytes:
+        return text
+    truncated = data[:max_bytes].decode("utf-8", errors="ignore")
+    line_end = truncated.rfind("\n")
+    return truncated[:line_end] if line_end > 0 else truncated
+
+
+class CardTemplate:
+    """预解析的卡片模板：注册时拆分为固定文本和字段名，渲染时只做拼接."""
+
+    __slots__ = ("segments", "fields")
+
+    def __init__(self, template: str):
+        parts = _FIELD_PATTERN.split(minify_xml(template))
+        # split 结果中偶数位是固定文本，奇数位是字段名
+        self.segments = parts
+        self.fields = frozenset(parts[1::2])
+
+    def render(self, values: dict) -> str:
+        parts = self.segments[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values.get(parts[i], "")
+        return "".join(parts)
+
+
+class CardRenderer:
+    """按卡片类型注册模板并渲染音乐卡片，渲染结果按 (卡片字段, 卡片类型, 机器人wxid) 缓存."""
+
+    def __init__(self, config: dict):
+        self.lyric_mode = config.get("lyric_mode", "full")              # full/off/lines/bytes
+        if self.lyric_mode not in LYRIC_MODES:
+            log.warning("未知的歌词模式，使用完整歌词 | 配置值: {}", self.lyric_mode)
+            self.lyric_mode = "full"
+        self.lyric_max_lines = int(config.get("lyric_max_lines", 20))
+        self.lyric_max_bytes = int(config.get("lyric_max_bytes", 2048))
+        # 未配置时只在 bytes 模式下去除时间标签；其他模式保留，<songlyric> 依赖时间标签同步歌词
+        self.strip_timestamps = config.get("strip_timestamps", self.lyric_mode == "bytes")
+        self.max_payload_bytes = int(config.get("max_payload_bytes", 16384))  # 0 表示不限制
+        self._templates: "dict[str, CardTemplate]" = {}
+        self._rendered = TTLCache(config.get("cache_size", 512), config.get("cache_ttl", 3600))
+        self.register("摇一摇搜歌", YAOYIYAO_TEMPLATE)
+        self.register(DEFAULT_CARD_TYPE, ORIGINAL_TEMPLATE)
+
+    @property
+    def card_types(self) -> list:
+        return list(self._templates)
+
+    def register(self, card_type: str, template: str):
+        """注册（或替换）一种卡片模板."""
+        self._templates[card_type] = CardTemplate(template)
+        self._rendered.clear()
+
+    def get(self, card_type: str) -> Optional[CardTemplate]:
+        return self._templates.get(card_type)
+
+    def prepare_lyric(self, lyric: str) -> str:
+        """按配置处理歌词：关闭、保留前N行或按字节数截断."""
+        if self.lyric_mode == "off" or not lyric:
+            return ""
+        if self.strip_timestamps:
+            lyric = strip_lrc(lyric)
+        if self.lyric_mode == "lines":
+            lyric = "\n".join(lyric.splitlines()[:self.lyric_max_lines])
+        elif self.lyric_mode == "bytes":
+            lyric = truncate_bytes(lyric, self.lyric_max_bytes)
+        return lyric
+
+    @staticmethod
+    def song_fields(song_data: dict) -> dict:
+        """从API返回的歌曲详情中提取卡片字段（已转义，不含歌词）."""
+        return {
+            "title": escape_xml(song_data.get("title")),
+            "singer": escape_xml(song_data.get("singer")),
+            "url": escape_xml(song_data.get("link")),
+            "music_url": escape_xml(str(song_data.get("music_url") or "").split("?")[0]),
+            "cover_url": escape_xml(song_data.get("cover")),
+        }
+
+    def render(self, card_type: str, song_data: dict, bot_wxid: str, ttl: Optional[float] = None) -> str:
+        """渲染音乐卡片XML，未注册的卡片类型使用原卡片模板.
+
+        渲染结果按参与渲染的字段缓存，同一首歌的播放链接或歌词更新后不会命中旧卡片；
+        ttl 为歌曲详情的剩余有效期，缓存时间不超过它。
+        """
+        if card_type not in self._templates:
+            card_type = DEFAULT_CARD_TYPE
+        cache_key = (
+            song_data.get("title"), song_data.get("singer"), song_data.get("link"),
+            song_data.get("music_url"), song_data.get("cover"), hash(str(song_data.get("lyrics") or "")),
+            card_type, bot_wxid,
+        )
+        xml = self._rendered.get(cache_key)
+        if xml is None:
+            xml = self._render(self._templates[card_type], song_data, bot_wxid)
+            if ttl is not None:
+                ttl = min(ttl, self._rendered.default_ttl)
+            self._rendered.set(cache_key, xml, ttl)
+        return xml
+
+    def _render(self, template: CardTemplate, song_data: dict, bot_wxid: str) -> str:
+        values = self.song_fields(song_data)
+        values["bot_wxid"] = escape_xml(bot_wxid)
+        lyric = self.prepare_lyric(str(song_data.get("lyrics") or ""))
+        values["lyric"] = escape_xml(lyric)
+        xml = template.render(values)
+        if not self.max_payload_bytes:
+            return xml
+        overflow = len(xml.encode("utf-8")) - self.max_payload_bytes
+        if overflow <= 0:
+            return xml
+        # 超出卡片字节预算：歌词是唯一的大字段，把歌词截短到剩余预算内后重新渲染
+        budget = len(values["lyric"].encode("utf-8")) - overflow
+        lyric = truncate_bytes(lyric, budget)
+        escaped = escape_xml(lyric)
+        excess = len(escaped.encode("utf-8")) - budget
+        if excess > 0:
+            # 转义会让文本变长；原文再少 excess 字节即可保证转义后不超预算
+            escaped = escape_xml(truncate_bytes(lyric, len(lyric.encode("utf-8")) - excess))
+        values["lyric"] = escaped
+        xml = template.render(values)
+        size = len(xml.encode("utf-8"))
+        if size > self.max_payload_bytes:
+            log.warning("卡片超出字节预算 | 歌曲: {} | 大小: {} | 预算: {}",
+                        song_data.get("title"), size, self.max_payload_bytes)
+        else:
+            log.info("卡片超出字节预算，已截短歌词 | 歌曲: {} | 超出: {} 字节 | 截短后大小: {}",
+                     song_data.get("title"), overflow, size)
+        return xml
@@ -0,0 +1,164 @@
+import asyncio
+import copy
+import os
+import tempfile
+import tomllib
+from typing import Any, Callable, Optional
+
+import tomli_w
+
+from .plugin_log import log
+
+CONFIG_PATH = "plugins/Music_puls/config.toml"
+SECTION = "Music_puls"
+
+_DELETED = object()  # _diff 中表示被删除的键
+
+
+def _diff(before: dict, after: dict, prefix: tuple = ()) -> dict:
+    """比较修改前后的配置，返回 {键路径: 新值}；被删除的键对应 _DELETED."""
+    changes = {}
+    for key in before.keys() | after.keys():
+        path = prefix + (key,)
+        old, new = before.get(key, _DELETED), after.get(key, _DELETED)
+        if isinstance(old, dict) and isinstance(new, dict):
+            changes.update(_diff(old, new, path))
+        elif old != new:
+            changes[path] = new if new is _DELETED else copy.deepcopy(new)
+    return changes
+
+
+def _patch(data: dict, changes: dict):
+    """把 _diff 得到的修改应用到另一份配置上."""
+    for path, value in changes.items():
+        node = data
+        for key in path[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+        if value is _DELETED:
+            node.pop(path[-1], None)
+        else:
+            node[path[-1]] = value
+
+
+class ConfigStore:
+    """插件配置存储：配置常驻内存，修改在 asyncio 锁内串行执行.
+
+    落盘在工作线程中完成（先写临时文件再重命名，避免写到一半的文件），
+    短时间内的多次修改合并为一次写入。配置文件在外部被修改过时，
+    只把插件修改过的键写入磁盘上的新内容，不覆盖手动编辑。
+    """
+
+    def __init__(self, path: str = CONFIG_PATH, debounce: float = 1.0):
+        self.path = path
+        self.debounce = float(debounce)   # 修改后延迟多少秒写盘，期间的修改合并写入
+        self.data, self.mtime = self._read()
+        self._lock = asyncio.Lock()       # 串行化内存中的修改
+        self._write_lock = asyncio.Lock()  # 串行化磁盘写入
+        self._flush_task: Optional[asyncio.Task] = None
+        self._changes: "dict[tuple, Any]" = {}  # 尚未落盘的修改：键路径 -> 新值
+
+    def _read(self) -> tuple:
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "rb") as f:
+            return tomllib.load(f), mtime
+
+    def changed(self) -> bool:
+        """配置文件是否在外部被修改过（插件自己写入的不算）."""
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except OSError:
+            return False
+
+    async def reload(self, apply: Callable[[dict], Any]) -> bool:
+        """在工作线程中重新读取配置文件，由 apply 校验并应用后替换内存中的配置.
+
+        apply 抛出异常时保留原配置并向上抛出；配置内容未变化时返回 False。
+        """
+        async with self._lock:
+            data, mtime = await asyncio.to_thread(self._read)
+            if data == self.data:
+                self.mtime = mtime
+                return False
+            try:
+                apply(data)
+            finally:
+                # 不合法的文件也记录其修改时间，避免定时检查反复报错
+                self.mtime = mtime
+            # 新配置应用成功后，尚未落盘的修改以磁盘上的新配置为准；
+            # 应用失败时保留这些修改，照常写盘
+            if self._flush_task is not None and not self._flush_task.done():
+                self._flush_task.cancel()
+            self._changes.clear()
+            self.data = data
+        return True
+
+    @property
+    def section(self) -> dict:
+        """插件配置段 [Music_puls]."""
+        return self.data[SECTION]
+
+    async def update(self, mutator: Callable[[dict], Any]) -> Any:
+        """在锁内修改配置段并安排写盘，返回 mutator 的返回值."""
+        async with self._lock:
+            before = copy.deepcopy(self.section)
+            result = mutator(self.section)
+            self._changes.update(_diff(before, self.section, (SECTION,)))
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_later())
+        return result
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce)
+        await self._flush()
+
+    async def _flush(self):
+        async with self._lock:
+            # 取快照后释放锁，写盘期间的新修改会安排下一次写入
+            snapshot = copy.deepcopy(self.data)
+            changes, self._changes = self._changes, {}
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None
+        async with self._write_lock:
+            try:
+                merged = await asyncio.to_thread(self._write, snapshot, changes)
+                if merged:
+                    log.info("配置文件已被外部修改，仅写入插件修改的配置项 | 路径: {}", self.path)
+                else:
+                    log.debug("配置已写入 | 路径: {}", self.path)
+            except Exception as e:
+                # 未写入的修改留到下一次写盘
+                self._changes = {**changes, **self._changes}
+                log.error("配置写入失败 | 路径: {} | 错误详情: {}", self.path, e)
+
+    def _write(self, data: dict, changes: dict) -> bool:
+        """写入配置；文件在外部被修改过时改为把 changes 应用到磁盘上的内容，返回是否合并写入."""
+        merged = self.changed()
+        if merged:
+            data, _ = self._read()
+            _patch(data, changes)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".config.", suffix=".toml.tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                tomli_w.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if not merged:
+            self.mtime = os.stat(self.path).st_mtime_ns
+        # 合并写入时不更新记录的修改时间，手动编辑的内容在下次重载时生效
+        return merged
+
+    async def close(self):
+        """立即写入尚未落盘的修改."""
+        task = self._flush_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self._flush()
@@ -0,0 +1,214 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+import aiohttp
+
+from .plugin_log import log
+
+
+class UpstreamError(Exception):
+    """上游API请求失败（已按配置重试并尝试了所有备用地址）."""
+
+
+class CircuitOpenError(UpstreamError):
+    """所有API地址均处于熔断状态，请求未发出."""
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class CircuitBreaker:
+    """单个API地址的熔断器：连续失败达到阈值后熔断，冷却结束后放行一次试探请求."""
+
+    __slots__ = ("threshold", "cooldown", "state", "failures", "opened_at", "total_failures", "total_successes")
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(1, int(threshold))
+        self.cooldown = float(cooldown)
+        self.state = self.CLOSED
+        self.failures = 0          # 连续失败次数
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_successes = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+            # 冷却结束：放行一次试探请求，其余请求在试探结束前继续快速失败
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def abort(self):
+        """试探请求被取消：恢复熔断状态，下一个请求可以重新试探."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = 0.0
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.total_successes += 1
+
+    def failure(self, now: float):
+        self.failures += 1
+        self.total_failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                log.warning("API地址熔断 | 连续失败: {} | 冷却: {}s", self.failures, self.cooldown)
+            self.state = self.OPEN
+            self.opened_at = now
+
+
+class MusicHttpClient:
+    """插件共享的 HTTP 客户端：懒加载一个长连接会话，所有上游请求复用连接池."""
+
+    def __init__(self, config: dict):
+        self.limit = int(config.get("limit", 100))                        # 连接池总连接数
+        self.limit_per_host = int(config.get("limit_per_host", 20))       # 单个主机最大连接数
+        self.keepalive_timeout = float(config.get("keepalive_timeout", 30))  # 空闲连接保活秒数
+        self.dns_cache_ttl = int(config.get("dns_cache_ttl", 300))        # DNS 缓存秒数
+        self.total_timeout = float(config.get("total_timeout", 15))
+        self.connect_timeout = float(config.get("connect_timeout", 5))
+        self.read_timeout = float(config.get("read_timeout", 10))
+        # 容错：单次调用的总时限、失败重试（指数退避+随机抖动）与按地址的熔断
+        self.deadline = float(config.get("deadline", 20))
+        self.max_retries = int(config.get("max_retries", 2))
+        self.backoff_base = float(config.get("backoff_base", 0.3))
+        self.backoff_max = float(config.get("backoff_max", 3))
+        self.breaker_threshold = int(config.get("breaker_threshold", 5))
+        self.breaker_cooldown = float(config.get("breaker_cooldown", 30))
+        self._breakers: "dict[str, CircuitBreaker]" = {}
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    async def session(self) -> aiohttp.ClientSession:
+        """获取共享会话，首次使用时创建；客户端关闭后不再创建新会话."""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._lock:
+            if self._closed:
+                raise UpstreamError("HTTP客户端已关闭")
+            # 双重检查：等待锁期间可能已有其他协程创建了会话
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    use_dns_cache=True,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                )
+                timeout = aiohttp.ClientTimeout(
+                    total=self.total_timeout,
+                    connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                )
+                self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+                log.debug("HTTP会话已创建 | 连接上限: {} | 单主机上限: {} | 总超时: {}s",
+                          self.limit, self.limit_per_host, self.total_timeout)
+        return self._session
+
+    async def close(self):
+        """关闭共享会话，释放连接池；之后的请求直接失败."""
+        async with self._lock:
+            self._closed = True
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+                log.debug("HTTP会话已关闭")
+            self._session = None
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def _backoff(self, attempt: int) -> float:
+        # 全抖动：在 [0, min(上限, 基数*2^n)] 内随机取值，避免多个请求同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, urls: Sequence[str], params: dict,
+                      handler: Callable[[aiohttp.ClientResponse], Awaitable[Any]]) -> Any:
+        """按优先级依次请求 urls，返回 handler(resp) 的结果.
+
+        连接错误、超时、5xx/429 会在同一地址上退避重试，该地址熔断或重试用尽后换下一个地址；
+        整个调用不超过 deadline 秒。全部失败时抛出 UpstreamError。
+        """
+        if self._closed:
+            raise UpstreamError("HTTP客户端已关闭")
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+        last_error: Optional[BaseException] = None
+        attempted = False
+        for url in urls:
+            breaker = self._breaker(url)
+            for attempt in range(self.max_retries + 1):
+                if not breaker.allow(time.monotonic()):
+                    break
+                if attempt:
+                    delay = self._backoff(attempt)
+                    if loop.time() + delay >= deadline_at:
+                        break
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                attempted = True
+                try:
+                    async with asyncio.timeout_at(deadline_at):
+                        session = await self.session()
+                        async with session.get(url, params=params) as resp:
+                            if resp.status >= 500 or resp.status == 429:
+                                raise _RetryableStatus(resp.status)
+                            result = await handler(resp)
+                    breaker.success()
+                    return result
+                except asyncio.CancelledError:
+                    breaker.abort()
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError, _RetryableStatus) as e:
+                    last_error = e
+                    log.warning("API请求失败 | 地址: {} | 第{}次尝试 | 错误详情: {!r}", url, attempt + 1, e)
+                    breaker.failure(time.monotonic())
+                except Exception as e:
+                    # 响应解析失败等不重试的错误同样计入熔断，试探请求不会一直停在半开状态
+                    log.warning("API响应处理失败 | 地址: {} | 错误详情: {!r}", url, e)
+                    breaker.failure(time.monotonic())
+                    self.failures += 1
+                    raise UpstreamError(f"API响应处理失败: {e!r}") from e
+                if loop.time() >= deadline_at:
+                    break
+            if loop.time() >= deadline_at:
+                break
+        self.failures += 1
+        if not attempted:
+            raise CircuitOpenError("所有API地址均处于熔断状态")
+        raise UpstreamError(f"API请求失败: {last_error!r}")
+
+    def stats(self) -> dict:
+        """上游健康状况：调用/重试/失败次数以及各地址的熔断状态."""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "endpoints": {
+                url: {
+                    "state": b.state,
+                    "consecutive_failures": b.failures,
+                    "successes": b.total_successes,
+                    "failures": b.total_failures,
+                }
+                for url, b in self._breakers.items()
+            },
+        }
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充令牌，最多积累 capacity 个."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float, cost: float = 1) -> float:
+        """获得 cost 个令牌还需等待的秒数."""
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float = 1):
+        # 令牌不足时允许欠账：调用方会先等待 delay() 秒，相当于预约了之后的令牌
+        self.tokens -= cost
+
+
+class KeyedLimiter:
+    """按键（用户或会话）分别维护令牌桶，超出 max_keys 时淘汰最久未使用的桶."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_keys = max(1, int(max_keys))
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+
+class RateLimiter:
+    """点歌限流：同时按发送者和会话限速，等待时间不超过 max_wait 的请求排队，其余拒绝."""
+
+    def __init__(self, config: dict):
+        self.enabled = config.get("enabled", True)
+        self.max_wait = float(config.get("max_wait", 2.0))   # 最长排队秒数
+        max_keys = config.get("max_tracked_keys", 10000)
+        # 速率 <= 0 表示不限制该维度
+        self.users = self._limiter(config.get("user_rate", 0.2), config.get("user_burst", 3), max_keys)
+        self.chats = self._limiter(config.get("group_rate", 1.0), config.get("group_burst", 10), max_keys)
+        self.rejected = 0
+
+    @staticmethod
+    def _limiter(rate: float, burst: float, max_keys: int) -> Optional[KeyedLimiter]:
+        return KeyedLimiter(rate, burst, max_keys) if float(rate) > 0 else None
+
+    def acquire(self, sender_wxid: str, from_wxid: str, cost: int = 1) -> Optional[float]:
+        """申请 cost 次点歌额度，返回需要等待的秒数；超出限制时返回 None 且不消耗额度.
+
+        cost 超过令牌桶容量时按容量计算，否则一次点歌数超过 burst 的批量点歌永远无法通过。
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        buckets = []
+        if self.users is not None:
+            buckets.append(self.users.bucket(sender_wxid, now))
+        if self.chats is not None:
+            buckets.append(self.chats.bucket(from_wxid, now))
+        delay = max((bucket.delay(now, min(cost, bucket.capacity)) for bucket in buckets), default=0.0)
+        if delay > self.max_wait:
+            self.rejected += 1
+            return None
+        for bucket in buckets:
+            bucket.take(min(cost, bucket.capacity))
+        return delay
@@ -1,106 +1,553 @@
+import asyncio
+import copy
+import re
+import time
 import tomllib
-import tomli_w  # 新增导入用于写入配置
-import aiohttp
-from loguru import logger
 
 from WechatAPI import WechatAPIClient
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
+from .cache import SearchResultStore, SingleFlight, TTLCache, make_key
+from .card import CardRenderer
+from .config_store import ConfigStore
+from .http_client import MusicHttpClient, UpstreamError
+from .limits import RateLimiter
+from .matcher import CommandMatcher
+from .metrics import Metrics, write_atomic
+from .parser import parse_song_list, parse_song_list_stream
+from .plugin_log import log
+from .sender import QueuedClient, SendDispatcher
+from .song_index import SongIndex
+from .store import SongStore
+
+
+# 管理员指令
+ADMIN_COMMANDS = ("切换卡片", "日志开关", "切换列表", "重载配置", "音乐统计")
+
 
 class Music_puls(PluginBase):
-    description = "点歌插件魔改版，支持指令：点歌 歌曲名、切换卡片、切换列表、日志开关。"
+    description = "点歌插件魔改版，支持指令：点歌 歌曲名、切换卡片、切换列表、日志开关、重载配置、音乐统计。"
     author = "电脑小白"
     version = "2.0.5"
 
     def __init__(self):
         super().__init__()
 
-        with open("plugins/Music_puls/config.toml", "rb") as f:
-            plugin_config = tomllib.load(f)
+        # 插件配置常驻内存，管理指令的修改经由 config_store 串行化并异步写盘
+        self.config_store = ConfigStore()
 
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
 
-        config = plugin_config["Music_puls"]
+        config = self.config_store.section
         main_config = main_config["XYBot"]
 
         self.admins = main_config["admins"]
+        # 每个会话最近一次的搜索记录（有容量上限，空闲超时后过期）
+        self.search_results = SearchResultStore()
+        # 响应缓存：列表与详情分别设置过期时间，music_url为签名链接，过期时间更短
+        self.cache = TTLCache()
+        # 本地歌曲索引：已获取过的歌曲按歌名/歌手模糊匹配到详情缓存，重复或有错别字的点歌无需请求API
+        self.song_index = SongIndex()
+        # 持久化缓存：歌曲详情写入SQLite，重启后在后台预热内存缓存（路径变更需重启生效）
+        persist_config = config.get("persist", {})
+        self.store = None
+        if persist_config.get("enabled", False):
+            self.store = SongStore(
+                persist_config.get("path", "plugins/Music_puls/song_cache.db"),
+                persist_config.get("max_age", 86400),
+                persist_config.get("warm_limit", 5000),
+            )
+        # 进行中的上游请求，按 (msg, n, type) 合并并发的相同请求
+        self.inflight = SingleFlight()
+        # 运行指标：命令计数与各环节耗时分布
+        self.metrics = Metrics()
+        self._metrics_dumped_at = 0.0
+        # 发送队列：回复按会话顺序异步发送，处理函数入队后即返回
+        self.outbox = SendDispatcher(self.metrics)
+        self._background_tasks = set()
+        # 从持久化缓存预热、播放链接已超过 music_url_ttl 的详情：首次命中时照常返回并在后台刷新
+        self._refresh_on_hit = set()
+        self._prefetch_tasks = {}
+        self.http = None
+        self.cards = None
+        self._limits_config = None
+        self._apply_config(config)
+        log.info("插件初始化完成 | 启用状态: {} | 触发命令: {} | 播放命令: {} | API地址: {} | 卡片类型: {}", self.enable, self.command, self.play_command, self.api_url, self.card_type)
+
+    @staticmethod
+    def _validate_config(config: dict):
+        """校验配置段，不合法时抛出 ValueError."""
+        for key in ("enable", "command", "command-format", "api_url", "api_key"):
+            if key not in config:
+                raise ValueError(f"缺少配置项 {key}")
+        command = config["command"]
+        if not isinstance(command, list) or not command or not all(isinstance(c, str) and c for c in command):
+            raise ValueError("command 必须是非空的字符串列表")
+        for url in [config["api_url"], *config.get("fallback_api_urls", [])]:
+            if not str(url).startswith(("http://", "https://")):
+                raise ValueError(f"API地址必须以 http:// 或 https:// 开头: {url}")
+
+    def _apply_config(self, config: dict):
+        """根据配置段设置插件参数.
+
+        先在局部变量中解析并校验全部配置（任何一项不合法都会在修改插件状态前抛出），
+        再统一赋值；赋值阶段不会抛出异常，也没有 await，对事件循环中的其他协程来说是一次原子切换。
+        进行中的请求继续使用切换前的 HTTP 会话，旧会话在最长请求时间过后关闭。
+        """
+        self._validate_config(config)
+        command = config["command"]
+        play_command = config.get("play_command", "播放")
+        api_url = config["api_url"]
+        search_config = config.get("search_results", {})
+        search_max_entries = max(1, int(search_config.get("max_entries", 1000)))
+        search_idle_ttl = float(search_config.get("idle_ttl", 600))
+        log_config = config.get("log", {})
+        log_enabled = bool(log_config.get("enabled", True))
+        log_level = str(log_config.get("level", "DEBUG"))
+        log_max_body = int(log_config.get("max_body", 512))
+        parser_config = config.get("parser", {})
+        max_results = int(parser_config.get("max_results", 30))
+        http_config = config.get("http", {})
+        http = None
+        if self.http is None or http_config != self._http_config:
+            http = MusicHttpClient(http_config)
+        card_config = config.get("card", {})
+        cards = None
+        if self.cards is None or card_config != self._card_config:
+            cards = CardRenderer(card_config)
+        cache_config = config.get("cache", {})
+        list_ttl = float(cache_config.get("list_ttl", 600))
+        detail_ttl = float(cache_config.get("detail_ttl", 3600))
+        music_url_ttl = float(cache_config.get("music_url_ttl", 300))
+        stale_ttl = float(cache_config.get("stale_ttl", 3600))
+        cache_max_entries = max(1, int(cache_config.get("max_entries", 2048)))
+        index_config = config.get("index", {})
+        index_max_entries = max(1, int(index_config.get("max_entries", 5000)))
+        index_min_score = float(index_config.get("min_score", 0.75))
+        prefetch_config = config.get("prefetch", {})
+        prefetch_top_k = int(prefetch_config.get("top_k", 3))
+        prefetch_semaphore = asyncio.Semaphore(max(1, int(prefetch_config.get("concurrency", 2))))
+        limits_config = config.get("limits", {})
+        limiter = None
+        if limits_config != self._limits_config:
+            limiter = RateLimiter(limits_config)
+            upstream_semaphore = asyncio.Semaphore(max(1, int(limits_config.get("max_concurrent_upstream", 8))))
+        batch_config = config.get("batch", {})
+        separators = [sep for sep in batch_config.get("separators", [";", "；"]) if sep]
+        batch_pattern = None
+        if batch_config.get("enabled", True) and separators:
+            batch_pattern = re.compile("|".join(re.escape(sep) for sep in separators))
+        batch_max_count = max(1, int(batch_config.get("max_count", 5)))
+        batch_concurrency = max(1, int(batch_config.get("concurrency", 3)))
+        sender_settings = SendDispatcher.parse_config(config.get("sender", {}))
+        metrics_config = config.get("metrics", {})
+        metrics_dump_interval = float(metrics_config.get("dump_interval", 60))
+        matcher = self._build_matcher(command, play_command)
+
+        # 以下只做赋值
         self.enable = config["enable"]
-        self.command = config["command"]
+        self.command = command
         self.command_format = config["command-format"]
-        self.play_command = config.get("play_command", "播放")
-        self.search_results = {}
-        self.api_url = config["api_url"]
+        self.play_command = play_command
+        self.search_results.max_entries = search_max_entries
+        self.search_results.idle_ttl = search_idle_ttl
+        self.api_url = api_url
+        # 备用API地址：主地址失败或熔断时按顺序尝试
+        self.api_urls = [api_url, *config.get("fallback_api_urls", [])]
         self.api_key = config["api_key"]
-        self.log_enabled = config.get("log", {}).get("enabled", True)
-        self.log_level = config.get("log", {}).get("level", "DEBUG").upper()
+        # 日志配置：所有插件日志经由 log 输出，未启用的级别不做格式化
+        log.configure(log_enabled, log_level, log_max_body)
         self.fetch_song_list = config.get("features", {}).get("fetch_song_list", True)
+        # 歌曲列表解析：可选流式解析，最多保留 max_results 首
+        self.parse_stream = parser_config.get("stream", False)
+        self.max_results = max_results
         # 新增：读取卡片类型配置（默认使用原卡片）
         self.card_type = config.get("card_type", "原卡片")  # 关键修改1
-        logger.level(self.log_level)
-        logger.info(f"插件初始化完成 | 启用状态: {self.enable} | 触发命令: {self.command} | 播放命令: {self.play_command} | API地址: {self.api_url} | 卡片类型: {self.card_type}")
+        # 共享HTTP会话：首次请求时创建，插件卸载时关闭；连接参数变化时换用新会话
+        if http is not None:
+            old_http, self.http = self.http, http
+            self._http_config = copy.deepcopy(http_config)
+            if old_http is not None:
+                self._spawn(self._close_later(old_http))
+        # 音乐卡片渲染：模板按卡片类型预解析注册，渲染结果按歌曲缓存
+        if cards is not None:
+            self.cards = cards
+            self._card_config = copy.deepcopy(card_config)
+        self.cache_enabled = cache_config.get("enabled", True)
+        self.list_ttl = list_ttl
+        self.detail_ttl = detail_ttl
+        self.music_url_ttl = music_url_ttl
+        self.stale_ttl = stale_ttl
+        self.cache.max_entries = cache_max_entries
+        self.cache.default_ttl = list_ttl
+        # 本地索引只指向详情缓存，关闭缓存时不生效；持久化开启时随缓存预热一起重建
+        self.index_enabled = index_config.get("enabled", True)
+        self.song_index.max_entries = index_max_entries
+        self.song_index.min_score = index_min_score
+        if not self.index_enabled:
+            self.song_index.clear()
+        # 列表模式预取：搜索后在后台并发获取前K首歌曲详情，「播放 N」直接命中缓存
+        self.prefetch_enabled = prefetch_config.get("enabled", False)
+        self.prefetch_top_k = prefetch_top_k
+        self._prefetch_semaphore = prefetch_semaphore
+        # 限流：按发送者/会话的令牌桶，以及全局上游并发上限
+        if limiter is not None:
+            self.limiter = limiter
+            self.limit_message = limits_config.get("reject_message", "点歌太频繁啦，请稍后再试～")
+            # 进行中的请求继续持有旧的信号量，新请求使用新的并发上限
+            self._upstream_semaphore = upstream_semaphore
+            self._limits_config = copy.deepcopy(limits_config)
+        # 批量点歌：「点歌 晴天; 稻香」，按分隔符拆分后并发获取
+        self._batch_pattern = batch_pattern
+        self.batch_max_count = batch_max_count
+        self.batch_concurrency = batch_concurrency
+        # 发送队列：全局发送速率、排队上限与失败重试
+        self.outbox.apply(sender_settings)
+        # 指标导出：定期写入文件（Prometheus 文本或 JSON），路径为空时不导出
+        self.metrics_dump_path = metrics_config.get("dump_path", "")
+        self.metrics_dump_format = metrics_config.get("dump_format", "prometheus")
+        self.metrics_dump_interval = metrics_dump_interval
+        # 配置热重载：定时检查配置文件修改时间
+        self.reload_watch = config.get("reload", {}).get("watch", False)
+        # 命令预筛选器：由配置中的命令构建，配置变化后需重新构建
+        self.matcher = matcher
+
+    def stats(self) -> dict:
+        """插件运行状况：缓存、请求合并、限流与上游健康状况."""
+        return {
+            "cache": self.cache.stats(),
+            "inflight": self.inflight.stats(),
+            "search_results": len(self.search_results),
+            "rate_limited": self.limiter.rejected,
+            "sender": self.outbox.stats(),
+            "index": self.song_index.stats(),
+            "upstream": self.http.stats(),
+        }
+
+    def _gauges(self) -> dict:
+        """导出用的即时数值."""
+        cache = self.cache.stats()
+        upstream = self.http.stats()
+        return {
+            "cache_size": cache["size"],
+            "cache_hit_ratio": cache["hit_ratio"],
+            "inflight_requests": len(self.inflight),
+            "search_results": len(self.search_results),
+            "send_queue_pending": len(self.outbox),
+            "song_index_size": len(self.song_index),
+            "upstream_endpoints_open": sum(1 for e in upstream["endpoints"].values() if e["state"] != "closed"),
+        }
+
+    def format_stats(self) -> str:
+        """生成「音乐统计」指令的回复文本."""
+        snapshot = self.metrics.snapshot()
+        stats = self.stats()
+        counters = snapshot["counters"]
+        cache = stats["cache"]
+        upstream = stats["upstream"]
+        lines = [
+            "-----Music_puls-----",
+            f"📊运行时间：{int(snapshot['uptime'] // 3600)}小时{int(snapshot['uptime'] % 3600 // 60)}分钟",
+            f"点歌：{counters.get('command_song', 0)} | 播放：{counters.get('command_play', 0)} | "
+            f"管理：{counters.get('command_admin', 0)} | 限流：{counters.get('rate_limited', 0)}",
+            f"缓存：命中率 {cache['hit_ratio']:.1%} | 条目 {cache['size']}/{cache['max_entries']} | "
+            f"兜底 {cache['stale_hits']}",
+            f"本地索引：条目 {stats['index']['size']} | 命中 {counters.get('index_hit', 0)}",
+            f"请求合并：上游调用 {stats['inflight']['calls']} | 合并 {stats['inflight']['shared']}",
+            f"上游：调用 {upstream['calls']} | 重试 {upstream['retries']} | 失败 {upstream['failures']}",
+            f"发送：成功 {stats['sender']['sent']} | 排队 {stats['sender']['pending']} | "
+            f"重试 {stats['sender']['retries']} | 失败 {stats['sender']['failures']} | 丢弃 {stats['sender']['dropped']}",
+        ]
+        for url, endpoint in upstream["endpoints"].items():
+            lines.append(f"  {url} → {endpoint['state']}（成功 {endpoint['successes']} / 失败 {endpoint['failures']}）")
+        labels = {
+            "fetch_song_list": "获取列表",
+            "fetch_song_data": "获取详情",
+            "upstream_request": "上游请求",
+            "render_card": "卡片渲染",
+            "send_queue_wait": "发送排队",
+            "send_app_message": "发送卡片",
+        }
+        for name, label in labels.items():
+            latency = snapshot["latency"].get(name)
+            if latency:
+                lines.append(f"{label}：{latency['count']}次 | p50 {latency['p50'] * 1000:.1f}ms | "
+                             f"p95 {latency['p95'] * 1000:.1f}ms | p99 {latency['p99'] * 1000:.1f}ms")
+        return "\n".join(lines)
+
+    @schedule('interval', seconds=10)
+    async def dump_metrics(self, bot: WechatAPIClient):
+        """按 dump_interval 定期把指标写入文件."""
+        if not self.metrics_dump_path or time.time() - self._metrics_dumped_at < self.metrics_dump_interval:
+            return
+        self._metrics_dumped_at = time.time()
+        if self.metrics_dump_format == "json":
+            text = self.metrics.to_json(self._gauges())
+        else:
+            text = self.metrics.to_prometheus(self._gauges())
+        try:
+            await asyncio.to_thread(write_atomic, self.metrics_dump_path, text)
+        except Exception as e:
+            log.error("指标导出失败 | 路径: {} | 错误详情: {}", self.metrics_dump_path, e)
+
+    async def _acquire_quota(self, bot: WechatAPIClient, message: dict, cost: int = 1) -> bool:
+        """申请点歌额度（每首歌一次）：额度不足时短暂排队，排队时间过长则回复提示并拒绝（管理员不受限制）."""
+        if message["SenderWxid"] in self.admins:
+            return True
+        delay = self.limiter.acquire(message["SenderWxid"], message["FromWxid"], cost)
+        if delay is None:
+            self.metrics.inc("rate_limited")
+            log.info("点歌请求被限流 | 用户: {} | 会话: {}", message["SenderWxid"], message["FromWxid"])
+            await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n⏳{self.limit_message}",
+                                      [message["SenderWxid"]])
+            return False
+        if delay > 0:
+            log.debug("点歌请求排队 | 用户: {} | 等待: {:.2f}s", message["SenderWxid"], delay)
+            await asyncio.sleep(delay)
+        return True
+
+    async def _close_later(self, client: MusicHttpClient):
+        """等待进行中的请求结束后关闭旧的HTTP会话."""
+        try:
+            # 单次调用含重试最长持续 deadline 秒，单个请求最长 total_timeout 秒
+            await asyncio.sleep(max(client.deadline, client.total_timeout))
+        finally:
+            # 插件卸载时任务被取消，同样要关闭旧会话
+            await client.close()
+
+    async def reload_config(self) -> bool:
+        """从磁盘重新读取配置并应用，配置不合法时保留当前配置.
+
+        返回是否应用了新配置；文件未变化时返回 False。
+        """
+        def apply(data: dict):
+            self._apply_config(data["Music_puls"])
+
+        if not await self.config_store.reload(apply):
+            return False
+        log.info("配置已重新加载 | 启用状态: {} | 触发命令: {} | 播放命令: {} | API地址: {} | 卡片类型: {}",
+                 self.enable, self.command, self.play_command, self.api_url, self.card_type)
+        return True
+
+    @schedule('interval', seconds=10)
+    async def watch_config(self, bot: WechatAPIClient):
+        """定时检查配置文件是否被修改，修改后自动重新加载."""
+        if not self.reload_watch or not self.config_store.changed():
+            return
+        try:
+            await self.reload_config()
+        except Exception as e:
+            log.error("配置自动重载失败，继续使用当前配置 | 错误详情: {}", e)
+
+    def _command_metric(self, token: str) -> str:
+        if token in self.command:
+            return "command_song"
+        if token == self.play_command:
+            return "command_play"
+        return "command_admin"
+
+    @staticmethod
+    def _build_matcher(command: list, play_command: str) -> CommandMatcher:
+        return CommandMatcher([*ADMIN_COMMANDS, *command, play_command])
+
+    async def async_init(self):
+        if self.store is not None:
+            # 预热放到后台执行，不阻塞插件加载
+            self._spawn(self._warm_cache())
+
+    async def on_disable(self):
+        await super().on_disable()
+        await self.config_store.close()
+        await self.outbox.close()
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.http.close()
+        if self.store is not None:
+            await self.store.close()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """创建后台任务并保留引用，避免任务被垃圾回收."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _warm_cache(self):
+        """从持久化缓存加载歌曲详情到内存缓存，按写入时间扣除已经过的有效期.
+
+        本地索引只记录歌名/歌手到 (搜索词, 序号) 的对应关系，不受详情有效期限制，
+        持久化保留期内的条目全部重建索引。
+        """
+        try:
+            entries = await self.store.load()
+        except Exception as e:
+            log.error("持久化缓存加载失败 | 错误详情: {}", e)
+            return
+        now = time.time()
+        warmed = 0
+        # 按写入时间从旧到新写入，使最新条目在LRU中最后被淘汰
+        for msg, n, data, saved_at in reversed(entries):
+            age = now - saved_at
+            # 歌名、歌手、歌词等元数据按 detail_ttl 预热；签名播放链接过期的条目命中后在后台刷新
+            ttl = self.detail_ttl - age
+            if ttl > 0:
+                cache_key = (msg, n, "json")
+                self.cache.set(cache_key, data, ttl)
+                if data.get("music_url") and age >= self.music_url_ttl:
+                    self._refresh_on_hit.add(cache_key)
+                warmed += 1
+            if self.index_enabled:
+                self.song_index.add(msg, n, data)
+        log.info("持久化缓存预热完成 | 读取条目: {} | 有效条目: {} | 索引条目: {}",
+                 len(entries), warmed, len(self.song_index))
+
+    async def _persist_song(self, msg: str, n: int, data: dict):
+        try:
+            await self.store.put(msg, n, data)
+        except Exception as e:
+            log.error("持久化缓存写入失败 | 歌曲名: {} | 序号: {} | 错误详情: {}", msg, n, e)
+
+    def _schedule_prefetch(self, chat_id: str, record):
+        """为会话的最新搜索启动预取任务，并取消该会话之前的预取."""
+        previous = self._prefetch_tasks.pop(chat_id, None)
+        if previous is not None:
+            previous.cancel()
+        task = self._spawn(self._prefetch(chat_id, record))
+        self._prefetch_tasks[chat_id] = task
+        task.add_done_callback(lambda t: self._forget_prefetch(chat_id, t))
+
+    def _forget_prefetch(self, chat_id: str, task: asyncio.Task):
+        if self._prefetch_tasks.get(chat_id) is task:
+            del self._prefetch_tasks[chat_id]
+
+    async def _prefetch(self, chat_id: str, record):
+        async def prefetch_one(index: int):
+            async with self._prefetch_semaphore:
+                # 搜索记录已过期或被新搜索替换时放弃预取
+                if self.search_results.peek(chat_id) is not record:
+                    return
+                await self._fetch_song_data(*record.resolve(index))
+
+        count = min(self.prefetch_top_k, record.count)
+        log.debug("开始预取歌曲详情 | 会话: {} | 搜索词: {} | 数量: {}", chat_id, record.keyword, count)
+        await asyncio.gather(*(prefetch_one(i) for i in range(1, count + 1)))
 
     async def _fetch_song_list(self, song_name: str) -> list:
         """调用API获取歌曲列表."""
+        with self.metrics.timer("fetch_song_list"):
+            cache_key = make_key(song_name, None, "text")
+            if self.cache_enabled:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    log.debug("歌曲列表命中缓存 | 歌曲名: {} | 歌曲数: {}", song_name, len(cached))
+                    return cached
+            # 相同搜索词的并发请求合并为一次上游调用
+            return await self.inflight.do(cache_key, lambda: self._request_song_list(song_name, cache_key))
+
+    async def _request_song_list(self, song_name: str, cache_key: tuple) -> list:
+        """请求上游API获取歌曲列表并写入缓存."""
         # 修复：补充type=text参数，明确要求API返回文本格式数据（与解析逻辑匹配）
         params = {
             "key": self.api_key,
             "msg": song_name,
             "type": "text"
         }
-        # 新增：日志开关控制
-        if self.log_enabled:
-            logger.debug(f"开始获取歌曲列表 | 歌曲名: {song_name} | 请求参数: {params}")
+        log.debug("开始获取歌曲列表 | 歌曲名: {} | 请求参数: {}", song_name, log.redact(params))
+
+        async def read_list(resp) -> list:
+            if self.parse_stream:
+                # 流式解析：逐行读取响应，达到数量上限后停止读取
+                log.debug("获取歌曲列表响应 | 状态码: {} | 流式解析", resp.status)
+                return await parse_song_list_stream(resp.content, self.max_results, resp.charset or "utf-8")
+            text = await resp.text()
+            # 新增：记录响应状态和内容长度
+            log.debug("获取歌曲列表响应 | 状态码: {} | 内容长度: {}", resp.status, len(text))
+            log.debug("API 响应: {}", log.body(text))  # 保留原有日志
+            return parse_song_list(text, self.max_results)
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.api_url, params=params) as resp:
-                    text = await resp.text()
-                    # 新增：记录响应状态和内容长度
-                    logger.debug(f"获取歌曲列表响应 | 状态码: {resp.status} | 内容长度: {len(text)}")
-                    logger.debug(f"API 响应: {text}")  # 保留原有日志
-                    song_list = self._parse_song_list(text)
-                    # 新增：记录解析结果
-                    logger.debug(f"歌曲列表解析完成 | 有效歌曲数: {len(song_list)}")
-                    return song_list
-        except aiohttp.ClientError as e:
+            async with self._upstream_semaphore:
+                with self.metrics.timer("upstream_request"):
+                    song_list = await self.http.request(self.api_urls, params, read_list)
+        except UpstreamError as e:
+            self.metrics.inc("upstream_error")
             # 修改：补充上下文信息
-            logger.error(f"获取歌曲列表失败 | 歌曲名: {song_name} | 错误详情: {str(e)}")
-            return []
-
-    def _parse_song_list(self, text: str) -> list:
-        """解析 TEXT 格式的歌曲列表."""
-        song_list = []
-        lines = text.splitlines()
-        logger.debug(f"开始解析歌曲列表 | 总行数: {len(lines)}")
-        for line in lines:
-            # 新增：过滤空行和无效行
-            if not line.strip():
-                continue
-            # 优化：支持多种分隔符（-、--、|），使用正则匹配
-            import re
-            parts = re.split(r'[\-|]+', line, maxsplit=1)  # 关键修改：使用正则分割多种可能的分隔符
-            if len(parts) == 2:
-                try:
-                    num_title, singer = parts
-                    # 优化：处理序号可能包含的特殊符号（如括号）
-                    num_title_parts = re.split(r'[、.]', num_title, maxsplit=1)  # 支持"1.标题"或"1、标题"格式
-                    if len(num_title_parts) == 2:
-                        num, title = num_title_parts
-                        song_list.append({
-                            "num": num.strip(),
-                            "title": title.strip(),
-                            "singer": singer.strip()
-                        })
-                    else:
-                        logger.warning(f"序号标题格式异常 | 行内容: {line}")
-                except Exception as e:
-                    logger.warning(f"行解析失败 | 行内容: {line} | 错误详情: {str(e)}")
-        logger.debug(f"歌曲列表解析结束 | 有效行数: {len(song_list)}")
+            log.error("获取歌曲列表失败 | 歌曲名: {} | 错误详情: {}", song_name, e)
+            return self._stale(cache_key) or []
+        # 新增：记录解析结果
+        log.debug("歌曲列表解析完成 | 有效歌曲数: {}", len(song_list))
+        if self.cache_enabled and song_list:
+            self.cache.set(cache_key, song_list, self.list_ttl)
         return song_list
 
+    def _stale(self, cache_key: tuple):
+        """上游不可用时读取已过期的缓存条目兜底."""
+        if not self.cache_enabled or self.stale_ttl <= 0:
+            return None
+        stale = self.cache.get_stale(cache_key, self.stale_ttl)
+        if stale is not None:
+            log.warning("上游不可用，使用过期缓存 | 缓存键: {}", cache_key)
+        return stale
+
+    def _detail_ttl(self, data: dict) -> float:
+        """详情缓存时间：包含签名播放链接时取更短的 music_url_ttl."""
+        if data.get("music_url"):
+            return min(self.detail_ttl, self.music_url_ttl)
+        return self.detail_ttl
+
+    def _cached_detail(self, cache_key: tuple):
+        """读取详情缓存；预热的条目播放链接已过期时，返回缓存内容并在后台重新获取."""
+        cached = self.cache.get(cache_key)
+        if cached is not None and cache_key in self._refresh_on_hit:
+            self._refresh_on_hit.discard(cache_key)
+            self._spawn(self._refresh_detail(cache_key))
+        return cached
+
+    async def _refresh_detail(self, cache_key: tuple):
+        msg, index, _ = cache_key
+        try:
+            await self.inflight.do(cache_key, lambda: self._request_song_data(msg, index, cache_key))
+        except Exception as e:
+            log.warning("后台刷新歌曲详情失败 | 歌曲名: {} | 序号: {} | 错误详情: {}", msg, index, e)
+
     async def _fetch_song_data(self, song_name: str, index: int) -> dict:
         """调用API获取歌曲信息，需要指定歌曲序号."""
+        with self.metrics.timer("fetch_song_data"):
+            cache_key = make_key(song_name, index, "json")
+            if self.cache_enabled:
+                cached = self._cached_detail(cache_key)
+                if cached is not None:
+                    log.debug("歌曲详情命中缓存 | 歌曲名: {} | 序号: {}", song_name, index)
+                    return cached
+            return await self.inflight.do(cache_key, lambda: self._request_song_data(song_name, index, cache_key))
+
+    async def _fetch_first_song(self, song_name: str) -> dict:
+        """获取搜索词的首条结果：本地索引有把握匹配时按匹配到的 (搜索词, 序号) 获取详情.
+
+        详情仍在缓存中时直接返回；已过期时按匹配到的搜索词重新获取，与之前点到的是同一首歌。
+        """
+        if self.index_enabled and self.cache_enabled:
+            match = self.song_index.search(song_name)
+            if match is not None:
+                cached = self._cached_detail((match.msg, match.n, "json"))
+                if cached is not None:
+                    self.metrics.inc("index_hit")
+                    log.debug("本地索引命中 | 搜索词: {} | 匹配: {} #{} | 相似度: {:.2f}",
+                              song_name, match.msg, match.n, match.score)
+                    return cached
+                song_data = await self._fetch_song_data(match.msg, match.n)
+                if song_data:
+                    return song_data
+                # 按匹配结果获取失败，索引条目失效，改用原搜索词
+                self.song_index.discard((match.msg, match.n))
+        return await self._fetch_song_data(song_name, 1)
+
+    async def _request_song_data(self, song_name: str, index: int, cache_key: tuple) -> dict:
+        """请求上游API获取歌曲详情并写入缓存."""
         # 修复：将歌曲名中的空格替换为+，适配API参数要求
         params = {
             "key": self.api_key,
@@ -109,38 +556,123 @@ class Music_puls(PluginBase):
             "type": "json",
         }
         # 新增：记录请求开始
-        logger.debug(f"开始获取歌曲详情 | 歌曲名: {song_name} | 序号: {index} | 请求参数: {params}")
+        log.debug("开始获取歌曲详情 | 歌曲名: {} | 序号: {} | 请求参数: {}", song_name, index, log.redact(params))
+
+        async def read_json(resp) -> tuple:
+            # 不校验 Content-Type，部分API以 text/html 返回JSON
+            return resp.status, await resp.json(content_type=None)
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.api_url, params=params) as resp:
-                    data = await resp.json()
-                    # 新增：记录响应状态和关键数据
-                    logger.debug(f"获取歌曲详情响应 | 状态码: {resp.status} | 响应code: {data.get('code')}")
-                    if data["code"] == 200:
-                        # 新增：记录成功信息
-                        logger.debug(f"歌曲详情获取成功 | 标题: {data.get('title')} | 歌手: {data.get('singer')}")
-                        return data
-                    else:
-                        # 修改：补充上下文信息
-                        logger.warning(f"歌曲详情获取失败 | 歌曲名: {song_name} | 序号: {index} | API返回: {data}")
-                        return None
-        except aiohttp.ClientError as e:
+            async with self._upstream_semaphore:
+                with self.metrics.timer("upstream_request"):
+                    resp_status, data = await self.http.request(self.api_urls, params, read_json)
+            # 新增：记录响应状态和关键数据
+            log.debug("获取歌曲详情响应 | 状态码: {} | 响应code: {}", resp_status, data.get('code'))
+            if data["code"] == 200:
+                # 新增：记录成功信息
+                log.debug("歌曲详情获取成功 | 标题: {} | 歌手: {}", data.get('title'), data.get('singer'))
+                if self.cache_enabled:
+                    self._refresh_on_hit.discard(cache_key)
+                    self.cache.set(cache_key, data, self._detail_ttl(data))
+                    if self.index_enabled:
+                        self.song_index.add(cache_key[0], index, data)
+                if self.store is not None:
+                    self._spawn(self._persist_song(cache_key[0], index, data))
+                return data
+            else:
+                # 修改：补充上下文信息
+                log.warning("歌曲详情获取失败 | 歌曲名: {} | 序号: {} | API返回: {}", song_name, index, log.body(data))
+                return None
+        except UpstreamError as e:
+            self.metrics.inc("upstream_error")
             # 修改：补充上下文信息
-            logger.error(f"获取歌曲详情失败 | 歌曲名: {song_name} | 序号: {index} | 网络错误: {str(e)}")
-            return None
+            log.error("获取歌曲详情失败 | 歌曲名: {} | 序号: {} | 网络错误: {}", song_name, index, e)
+            return self._stale(cache_key)
         except Exception as e:
             # 保留原有异常日志并补充上下文
-            logger.exception(f"歌曲详情解析失败 | 歌曲名: {song_name} | 序号: {index} | 错误详情: {str(e)}")
+            log.exception("歌曲详情解析失败 | 歌曲名: {} | 序号: {} | 错误详情: {}", song_name, index, e)
             return None
 
+    async def _send_card(self, bot: WechatAPIClient, to_wxid: str, song_data: dict):
+        """渲染并发送音乐卡片."""
+        with self.metrics.timer("render_card"):
+            xml = self.cards.render(self.card_type, song_data, bot.wxid, self._detail_ttl(song_data))
+        await bot.send_app_message(to_wxid, xml, 3)
+
+    def _split_batch(self, song_name: str) -> list:
+        """按批量分隔符拆分搜索词，去掉空项."""
+        if self._batch_pattern is None:
+            return [song_name]
+        return [name for name in (n.strip() for n in self._batch_pattern.split(song_name)) if name]
+
+    async def _gather_bounded(self, func, args_list: list) -> list:
+        """以 batch.concurrency 为并发上限执行 func(*args)，结果顺序与 args_list 一致."""
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run(args):
+            async with semaphore:
+                return await func(*args)
+
+        return await asyncio.gather(*(run(args) for args in args_list))
+
+    async def _handle_batch(self, bot: WechatAPIClient, message: dict, songs: list) -> bool:
+        """批量点歌：并发获取所有歌曲，按输入顺序返回卡片或合并后的歌曲列表."""
+        log.info("触发批量点歌 | 用户: {} | 歌曲数: {} | 歌曲: {}", message["SenderWxid"], len(songs), songs)
+        if self.fetch_song_list:
+            results = await self._gather_bounded(self._fetch_song_list, [(name,) for name in songs])
+            segments = []
+            missing = []
+            response_text = "🎶----- 找到以下歌曲 -----🎶\n"
+            number = 0
+            for name, song_list in zip(songs, results):
+                if not song_list:
+                    missing.append(name)
+                    continue
+                segments.append((name, tuple(int(song.num) for song in song_list)))
+                response_text += f"【{name}】\n"
+                for song in song_list:
+                    number += 1
+                    response_text += f"{number}. 🎵 {song.title} - {song.singer} 🎤\n"
+            if not segments:
+                await bot.send_at_message(message["FromWxid"], "-----Music_puls-----\n❌未找到相关歌曲！",
+                                          [message["SenderWxid"]])
+                return False
+            if missing:
+                response_text += f"❌未找到：{'、'.join(missing)}\n"
+            response_text += "_________________________\n"
+            response_text += f"🎵输入 “{self.play_command} + 序号” 播放歌曲🎵"
+            record = self.search_results.put(message["FromWxid"], tuple(segments))
+            if self.prefetch_enabled and self.cache_enabled:
+                self._schedule_prefetch(message["FromWxid"], record)
+            await bot.send_at_message(message["FromWxid"], response_text, [message["SenderWxid"]])
+            return False
+
+        results = await self._gather_bounded(self._fetch_first_song, [(name,) for name in songs])
+        missing = []
+        for name, song_data in zip(songs, results):
+            if song_data:
+                await self._send_card(bot, message["FromWxid"], song_data)
+            else:
+                missing.append(name)
+        if missing:
+            log.error("批量点歌部分失败 | 歌曲: {}", missing)
+            await bot.send_at_message(message["FromWxid"],
+                                      f"-----Music_puls-----\n❌获取歌曲信息失败：{'、'.join(missing)}",
+                                      [message["SenderWxid"]])
+        return False
+
     @on_text_message
     async def handle_text(self, bot: WechatAPIClient, message: dict) -> bool:
-        # 新增：日志开关控制
-        if self.log_enabled:
-            logger.info(f"收到用户消息 | 发送者: {message['SenderWxid']} | 内容: {message['Content']}")
+        # 预筛选：首个词不是插件命令的消息直接放行，不做日志、分割等任何处理
+        token = self.matcher.match(message["Content"])
+        if token is None:
+            return True
+        self.metrics.inc(self._command_metric(token))
+        # 回复经由发送队列发出，不在处理函数中等待微信接口
+        bot = QueuedClient(bot, self.outbox)
+        log.info("收到用户消息 | 发送者: {} | 内容: {}", message['SenderWxid'], message['Content'])
         if not self.enable:
-            if self.log_enabled:
-                logger.debug("插件未启用 | 忽略当前消息")
+            log.debug("插件未启用 | 忽略当前消息")
             return True
 
         content = str(message["Content"]).strip()
@@ -152,19 +684,17 @@ class Music_puls(PluginBase):
             if sender_wxid not in self.admins:
                 await bot.send_text_message(message["FromWxid"], "你没有权限使用此命令")
                 return False
-            if self.log_enabled:
-                logger.info(f"触发卡片切换指令 | 用户: {message['SenderWxid']}")
+            log.info("触发卡片切换指令 | 用户: {}", message['SenderWxid'])
             try:
-                # 读取当前配置
-                with open("plugins/Music_puls/config.toml", "rb") as f:
-                    plugin_config = tomllib.load(f)
-                # 切换卡片类型
-                current_type = plugin_config["Music_puls"]["card_type"]
-                new_type = "原卡片" if current_type == "摇一摇搜歌" else "摇一摇搜歌"
-                plugin_config["Music_puls"]["card_type"] = new_type
-                # 写入新配置
-                with open("plugins/Music_puls/config.toml", "wb") as f:
-                    tomli_w.dump(plugin_config, f)
+                # 切换卡片类型：在已注册的卡片类型之间轮换
+                def toggle_card(section: dict) -> tuple:
+                    current = section.get("card_type", self.card_type)
+                    card_types = self.cards.card_types
+                    next_index = card_types.index(current) + 1 if current in card_types else 0
+                    section["card_type"] = card_types[next_index % len(card_types)]
+                    return current, section["card_type"]
+
+                current_type, new_type = await self.config_store.update(toggle_card)
                 # 更新实例属性
                 self.card_type = new_type
                 await bot.send_at_message(
@@ -172,68 +702,62 @@ class Music_puls(PluginBase):
                     f"-----Music_puls-----\n✅卡片类型已切换为：{new_type}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:
-                    logger.info(f"卡片类型切换成功 | 原类型: {current_type} → 新类型: {new_type}")
+                log.info("卡片类型切换成功 | 原类型: {} → 新类型: {}", current_type, new_type)
             except Exception as e:
                 await bot.send_at_message(
                     message["FromWxid"],
                     f"-----Music_puls-----\n❌切换失败：{str(e)}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:
-                    logger.error(f"卡片切换异常 | 错误: {str(e)}")
+                log.error("卡片切换异常 | 错误: {}", e)
             return False
 
         if command[0] == "日志开关":
             if sender_wxid not in self.admins:
                 await bot.send_text_message(message["FromWxid"], "你没有权限使用此命令")
                 return False
-            if self.log_enabled:
-                logger.info(f"触发日志开关指令 | 用户: {message['SenderWxid']}")
+            log.info("触发日志开关指令 | 用户: {}", message['SenderWxid'])
             try:
-                with open("plugins/Music_puls/config.toml", "rb") as f:
-                    plugin_config = tomllib.load(f)
                 # 切换日志状态
-                current_status = plugin_config["Music_puls"]["log"]["enabled"]
-                new_status = not current_status
-                plugin_config["Music_puls"]["log"]["enabled"] = new_status
-                with open("plugins/Music_puls/config.toml", "wb") as f:
-                    tomli_w.dump(plugin_config, f)
+                def toggle_log(section: dict) -> tuple:
+                    log_section = section.setdefault("log", {})
+                    current = log_section.get("enabled", log.enabled)
+                    log_section["enabled"] = not current
+                    return current, not current
+
+                current_status, new_status = await self.config_store.update(toggle_log)
                 # 更新实例属性
-                self.log_enabled = new_status
+                log.enabled = new_status
                 status_text = "启用" if new_status else "禁用"
                 await bot.send_at_message(
                     message["FromWxid"],
                     f"-----Music_puls-----\n✅日志功能已{status_text}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:  # 切换后如果启用才记录日志
-                    logger.info(f"日志状态切换成功 | 原状态: {current_status} → 新状态: {new_status}")
+                log.info("日志状态切换成功 | 原状态: {} → 新状态: {}", current_status, new_status)
             except Exception as e:
                 await bot.send_at_message(
                     message["FromWxid"],
                     f"-----Music_puls-----\n❌日志开关失败：{str(e)}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:
-                    logger.error(f"日志开关异常 | 错误: {str(e)}")
+                log.error("日志开关异常 | 错误: {}", e)
             return False
 
         if command[0] == "切换列表":
             if sender_wxid not in self.admins:
                 await bot.send_text_message(message["FromWxid"], "你没有权限使用此命令")
                 return False
-            if self.log_enabled:
-                logger.info(f"触发列表显示开关指令 | 用户: {message['SenderWxid']}")
+            log.info("触发列表显示开关指令 | 用户: {}", message['SenderWxid'])
             try:
-                with open("plugins/Music_puls/config.toml", "rb") as f:
-                    plugin_config = tomllib.load(f)
                 # 切换列表显示状态
-                current_status = plugin_config["Music_puls"]["features"]["fetch_song_list"]
-                new_status = not current_status
-                plugin_config["Music_puls"]["features"]["fetch_song_list"] = new_status
-                with open("plugins/Music_puls/config.toml", "wb") as f:
-                    tomli_w.dump(plugin_config, f)
+                def toggle_list(section: dict) -> tuple:
+                    features = section.setdefault("features", {})
+                    current = features.get("fetch_song_list", self.fetch_song_list)
+                    features["fetch_song_list"] = not current
+                    return current, not current
+
+                current_status, new_status = await self.config_store.update(toggle_list)
                 # 更新实例属性
                 self.fetch_song_list = new_status
                 status_text = "显示" if new_status else "隐藏"
@@ -242,266 +766,125 @@ class Music_puls(PluginBase):
                     f"-----Music_puls-----\n✅歌曲列表现在{status_text}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:
-                    logger.info(f"列表显示状态切换成功 | 原状态: {current_status} → 新状态: {new_status}")
+                log.info("列表显示状态切换成功 | 原状态: {} → 新状态: {}", current_status, new_status)
             except Exception as e:
                 await bot.send_at_message(
                     message["FromWxid"],
                     f"-----Music_puls-----\n❌列表开关失败：{str(e)}",
                     [message["SenderWxid"]]
                 )
-                if self.log_enabled:
-                    logger.error(f"列表开关异常 | 错误: {str(e)}")
+                log.error("列表开关异常 | 错误: {}", e)
+            return False
+
+        if command[0] == "音乐统计":
+            if sender_wxid not in self.admins:
+                await bot.send_text_message(message["FromWxid"], "你没有权限使用此命令")
+                return False
+            log.info("触发音乐统计指令 | 用户: {}", message['SenderWxid'])
+            await bot.send_at_message(message["FromWxid"], self.format_stats(), [message["SenderWxid"]])
+            return False
+
+        if command[0] == "重载配置":
+            if sender_wxid not in self.admins:
+                await bot.send_text_message(message["FromWxid"], "你没有权限使用此命令")
+                return False
+            log.info("触发重载配置指令 | 用户: {}", message['SenderWxid'])
+            try:
+                reloaded = await self.reload_config()
+                reply = "✅配置已重新加载" if reloaded else "✅配置文件没有变化"
+                await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n{reply}",
+                                          [message["SenderWxid"]])
+            except Exception as e:
+                await bot.send_at_message(
+                    message["FromWxid"],
+                    f"-----Music_puls-----\n❌重载失败，继续使用当前配置：{str(e)}",
+                    [message["SenderWxid"]]
+                )
+                log.error("重载配置异常 | 错误: {}", e)
             return False
 
         if command[0] not in self.command and command[0] != self.play_command:
             # 新增：记录不匹配的命令
-            logger.debug(f"命令不匹配 | 当前命令: {command[0]} | 有效命令: {self.command + [self.play_command]}")
+            log.debug("命令不匹配 | 当前命令: {} | 有效命令: {}", command[0], self.command + [self.play_command])
             return True
 
         if command[0] in self.command:  # 处理 "点歌" 命令
-            if self.log_enabled:
-                logger.info(f"触发点歌命令 | 用户: {message['SenderWxid']} | 原始内容: {content}")
+            log.info("触发点歌命令 | 用户: {} | 原始内容: {}", message['SenderWxid'], content)
             if len(command) == 1:
-                if self.log_enabled:
-                    logger.warning(f"点歌命令格式错误 | 用户: {message['SenderWxid']} | 内容: {content}")
+                log.warning("点歌命令格式错误 | 用户: {} | 内容: {}", message['SenderWxid'], content)
                 await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌命令格式错误！{self.command_format}",
                                           [message["SenderWxid"]])
                 return False
 
             song_name = content[len(command[0]):].strip()
+            songs = self._split_batch(song_name)
+            if not songs:
+                # 只有分隔符，如「点歌 ;」
+                await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌命令格式错误！{self.command_format}",
+                                          [message["SenderWxid"]])
+                return False
+            if len(songs) > self.batch_max_count:
+                await bot.send_at_message(message["FromWxid"],
+                                          f"-----Music_puls-----\n❌一次最多点{self.batch_max_count}首歌！",
+                                          [message["SenderWxid"]])
+                return False
+            if not await self._acquire_quota(bot, message, len(songs)):
+                return False
+            if len(songs) > 1:
+                self.metrics.inc("command_batch")
+                return await self._handle_batch(bot, message, songs)
+            # 去掉首尾多余的分隔符，如「点歌 晴天；」
+            song_name = songs[0]
 
             # 新增：根据配置决定是否获取歌曲列表
             if self.fetch_song_list:
                 # 原有列表获取逻辑
                 song_list = await self._fetch_song_list(song_name)
                 if not song_list:
-                    if self.log_enabled:
-                        logger.warning(f"歌曲搜索无结果 | 搜索词: {song_name}")
+                    log.warning("歌曲搜索无结果 | 搜索词: {}", song_name)
                     await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌未找到相关歌曲！",
                                           [message["SenderWxid"]])
                     return False
                 # 构建并发送歌曲列表
                 response_text = "🎶----- 找到以下歌曲 -----🎶\n"
                 for i, song in enumerate(song_list):
-                    response_text += f"{i + 1}. 🎵 {song['title']} - {song['singer']} 🎤\n"
+                    response_text += f"{i + 1}. 🎵 {song.title} - {song.singer} 🎤\n"
                 response_text += "_________________________\n"
                 response_text += f"🎵输入 “{self.play_command} + 序号” 播放歌曲🎵"
-                self.search_results[message["FromWxid"]] = song_list
+                nums = tuple(int(song.num) for song in song_list)
+                record = self.search_results.put(message["FromWxid"], ((song_name, nums),))
+                if self.prefetch_enabled and self.cache_enabled:
+                    self._schedule_prefetch(message["FromWxid"], record)
                 await bot.send_at_message(message["FromWxid"], response_text, [message["SenderWxid"]])
                 return False
             else:
                 # 直接获取首歌曲逻辑
-                if self.log_enabled:
-                    logger.debug(f"直接获取首歌曲详情 | 歌曲名: {song_name}")
-                song_data = await self._fetch_song_data(song_name, 1)
+                log.debug("直接获取首歌曲详情 | 歌曲名: {}", song_name)
+                song_data = await self._fetch_first_song(song_name)
                 if song_data:
-                    title = song_data["title"]
-                    singer = song_data["singer"]
-                    url = song_data.get("link", "")
-                    music_url = song_data.get("music_url", "").split("?")[0]
-                    cover_url = song_data.get("cover", "")  # 确保cover字段有效
-                    lyric = song_data.get("lyrics", "")
-                    
-                    # 根据卡片类型选择模板（优化图片显示）
-                    if self.card_type == "摇一摇搜歌":
-                        xml = f"""<appmsg appid="wx485a97c844086dc9" sdkver="0">
-    <title>{title}</title>
-    <des>{singer}</des>
-    <action>view</action>
-    <type>3</type>
-    <showtype>0</showtype>
-    <content/>
-    <url>{url}</url>
-    <dataurl>{music_url}</dataurl>
-    <lowurl>{url}</lowurl>
-    <lowdataurl>{music_url}</lowdataurl>
-    <thumburl /> <!-- 改为空标签 -->
-    <songlyric>{lyric}</songlyric>
-    <songalbumurl>{cover_url}</songalbumurl> <!-- 依赖此字段显示图片 -->
-    <appattach> <!-- 恢复简洁结构 -->
-        <totallen>0</totallen>
-        <attachid/>
-        <emoticonmd5/>
-        <fileext/>
-        <aeskey/>
-    </appattach>
-    <weappinfo>
-        <pagepath/>
-        <username/>
-        <appid/>
-        <appservicetype>0</appservicetype>
-    </weappinfo>
-</appmsg>
-<fromusername>{bot.wxid}</fromusername>
-<scene>0</scene>
-<appinfo>
-    <version>29</version>
-    <appname>摇一摇搜歌</appname>
-</appinfo>
-<commenturl/>"""
-                    else:
-                        xml = f"""<appmsg appid="wx79f2c4418704b4f8" sdkver="0">
-    <title>{title}</title>
-    <des>{singer}</des>
-    <action>view</action>
-    <type>3</type>
-    <showtype>0</showtype>
-    <content/>
-    <url>{url}</url>
-    <dataurl>{music_url}</dataurl>
-    <lowurl>{url}</lowurl>
-    <lowdataurl>{music_url}</lowdataurl>
-    <recorditem/>
-    <thumburl /> <!-- 改为空标签 -->
-    <messageaction/>
-    <laninfo/>
-    <extinfo/>
-    <sourceusername/>
-    <sourcedisplayname/>
-    <songlyric>{lyric}</songlyric>
-    <commenturl/>
-    <appattach> <!-- 恢复简洁结构 -->
-        <totallen>0</totallen>
-        <attachid/>
-        <emoticonmd5/>
-        <fileext/>
-        <aeskey/>
-    </appattach>
-    <webviewshared>
-        <publisherId/>
-        <publisherReqId>0</publisherReqId>
-    </webviewshared>
-    <weappinfo>
-        <pagepath/>
-        <username/>
-        <appid/>
-        <appservicetype>0</appservicetype>
-    </weappinfo>
-    <websearch/>
-    <songalbumurl>{cover_url}</songalbumurl>
-</appmsg>
-<fromusername>{bot.wxid}</fromusername>
-<scene>0</scene>
-<appinfo>
-    <version>1</version>
-    <appname/>
-</appinfo>
-<commenturl/>"""
-                    await bot.send_app_message(message["FromWxid"], xml, 3)
+                    await self._send_card(bot, message["FromWxid"], song_data)
                     return False
                 else:
-                    if self.log_enabled:
-                        logger.error(f"获取歌曲信息失败 | 歌曲名: {song_name}")
+                    log.error("获取歌曲信息失败 | 歌曲名: {}", song_name)
                     await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌获取歌曲信息失败！",
                                           [message["SenderWxid"]])
                     return False
 
         elif command[0] == self.play_command:  # 处理 "播放" 命令
             # 新增：记录播放命令触发
-            logger.info(f"触发播放命令 | 用户: {message['SenderWxid']} | 原始内容: {content}")
+            log.info("触发播放命令 | 用户: {} | 原始内容: {}", message['SenderWxid'], content)
             try:
                 index = int(command[1].strip())
                 # 新增：记录播放序号
-                logger.debug(f"尝试播放歌曲 | 用户: {message['SenderWxid']} | 目标序号: {index}")
-                if message["FromWxid"] in self.search_results and 1 <= index <= len(
-                        self.search_results[message["FromWxid"]]):
-                    selected_song = self.search_results[message["FromWxid"]][index - 1]
-                    song_data = await self._fetch_song_data(selected_song["title"], index)
+                log.debug("尝试播放歌曲 | 用户: {} | 目标序号: {}", message['SenderWxid'], index)
+                if not await self._acquire_quota(bot, message):
+                    return False
+                record = self.search_results.get(message["FromWxid"])
+                if record is not None and 1 <= index <= record.count:
+                    # 按原搜索词和序号获取详情，与列表中的序号一一对应
+                    song_data = await self._fetch_song_data(*record.resolve(index))
                     if song_data:
-                        title = song_data["title"]
-                        singer = song_data["singer"]
-                        url = song_data.get("link", "")
-                        music_url = song_data.get("music_url", "").split("?")[0]
-                        cover_url = song_data.get("cover", "")  # 确保cover字段有效
-                        lyric = song_data.get("lyrics", "")
-
-                        # 根据卡片类型选择模板（优化图片显示）
-                        if self.card_type == "摇一摇搜歌":
-                            xml = f"""<appmsg appid="wx485a97c844086dc9" sdkver="0">
-    <title>{title}</title>
-    <des>{singer}</des>
-    <action>view</action>
-    <type>3</type>
-    <showtype>0</showtype>
-    <content/>
-    <url>{url}</url>
-    <dataurl>{music_url}</dataurl>
-    <lowurl>{url}</lowurl>
-    <lowdataurl>{music_url}</lowdataurl>
-    <thumburl /> <!-- 改为空标签 -->
-    <songlyric>{lyric}</songlyric>
-    <songalbumurl>{cover_url}</songalbumurl> <!-- 依赖此字段显示图片 -->
-    <appattach> <!-- 恢复简洁结构 -->
-        <totallen>0</totallen>
-        <attachid/>
-        <emoticonmd5/>
-        <fileext/>
-        <aeskey/>
-    </appattach>
-    <weappinfo>
-        <pagepath/>
-        <username/>
-        <appid/>
-        <appservicetype>0</appservicetype>
-    </weappinfo>
-</appmsg>
-<fromusername>{bot.wxid}</fromusername>
-<scene>0</scene>
-<appinfo>
-    <version>29</version>
-    <appname>摇一摇搜歌</appname>
-</appinfo>
-<commenturl/>"""
-                        else:
-                            xml = f"""<appmsg appid="wx79f2c4418704b4f8" sdkver="0">
-    <title>{title}</title>
-    <des>{singer}</des>
-    <action>view</action>
-    <type>3</type>
-    <showtype>0</showtype>
-    <content/>
-    <url>{url}</url>
-    <dataurl>{music_url}</dataurl>
-    <lowurl>{url}</lowurl>
-    <lowdataurl>{music_url}</lowdataurl>
-    <recorditem/>
-    <thumburl /> <!-- 改为空标签 -->
-    <messageaction/>
-    <laninfo/>
-    <extinfo/>
-    <sourceusername/>
-    <sourcedisplayname/>
-    <songlyric>{lyric}</songlyric>
-    <commenturl/>
-    <appattach> <!-- 恢复简洁结构 -->
-        <totallen>0</totallen>
-        <attachid/>
-        <emoticonmd5/>
-        <fileext/>
-        <aeskey/>
-    </appattach>
-    <webviewshared>
-        <publisherId/>
-        <publisherReqId>0</publisherReqId>
-    </webviewshared>
-    <weappinfo>
-        <pagepath/>
-        <username/>
-        <appid/>
-        <appservicetype>0</appservicetype>
-    </weappinfo>
-    <websearch/>
-    <songalbumurl>{cover_url}</songalbumurl>
-</appmsg>
-<fromusername>{bot.wxid}</fromusername>
-<scene>0</scene>
-<appinfo>
-    <version>1</version>
-    <appname/>
-</appinfo>
-<commenturl/>"""
-                        await bot.send_app_message(message["FromWxid"], xml, 3)
+                        await self._send_card(bot, message["FromWxid"], song_data)
                         return False  # 成功发送歌曲，阻止其他插件
                     else:
                         await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌获取歌曲信息失败！",
@@ -513,7 +896,7 @@ class Music_puls(PluginBase):
                     return False  # 已处理错误消息，阻止其他插件
             except ValueError:
                 # 新增：记录序号格式错误
-                logger.warning(f"播放序号格式错误 | 用户: {message['SenderWxid']} | 内容: {content}")
+                log.warning("播放序号格式错误 | 用户: {} | 内容: {}", message['SenderWxid'], content)
                 await bot.send_at_message(message["FromWxid"], f"-----Music_puls-----\n❌请输入有效的歌曲序号！",
                                           [message["SenderWxid"]])
                 return False  # 已处理错误消息，阻止其他插件
@@ -0,0 +1,33 @@
+from typing import Iterable, Optional
+
+
+class CommandMatcher:
+    """消息预筛选：按首个词匹配插件命令，不相关的消息在进入处理流程前直接放行.
+
+    先用首字符集合做 O(1) 判断（绝大多数聊天消息在这一步被排除），
+    首字符命中时才截取首个词并在命令集合中查找。
+    """
+
+    __slots__ = ("commands", "first_chars", "max_length")
+
+    def __init__(self, commands: Iterable[str]):
+        self.commands = frozenset(c for c in commands if c)
+        self.first_chars = frozenset(c[0] for c in self.commands)
+        self.max_length = max((len(c) for c in self.commands), default=0)
+
+    def match(self, content) -> Optional[str]:
+        """返回命中的命令词，不是插件命令时返回 None."""
+        if not isinstance(content, str):
+            content = str(content)
+        if not content:
+            return None
+        if content[0].isspace():
+            content = content.lstrip()
+            if not content:
+                return None
+        if content[0] not in self.first_chars:
+            return None
+        # 命令词后必须是空格或消息结尾，与 content.split(" ")[0] 的结果保持一致
+        end = content.find(" ", 0, self.max_length + 1)
+        token = content[:end] if end != -1 else content[:self.max_length + 1].rstrip()
+        return token if token in self.commands else None
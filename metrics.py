@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Histogram:
+    """耗时分布：累计次数与总和，分位数基于最近 window 个样本计算."""
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+        }
+
+
+class Metrics:
+    """进程内指标：计数器与耗时直方图，可导出为 JSON 或 Prometheus 文本格式."""
+
+    def __init__(self, prefix: str = "music_puls", window: int = 1024):
+        self.prefix = prefix
+        self.window = window
+        self.started_at = time.time()
+        self.counters: "dict[str, int]" = {}
+        self.histograms: "dict[str, Histogram]" = {}
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(self.window)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """记录代码块耗时（秒），异常退出时同样记录."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self, gauges: dict = None) -> dict:
+        return {
+            "uptime": time.time() - self.started_at,
+            "counters": dict(self.counters),
+            "latency": {name: h.summary() for name, h in self.histograms.items()},
+            "gauges": gauges or {},
+        }
+
+    def to_json(self, gauges: dict = None) -> str:
+        return json.dumps(self.snapshot(gauges), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, gauges: dict = None) -> str:
+        """导出为 Prometheus 文本格式（耗时直方图以 summary 形式导出）."""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            summary = histogram.summary()
+            lines.append(f"# TYPE {metric} summary")
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(f'{metric}{{quantile="{quantile}"}} {summary[key]:.6f}')
+            lines.append(f"{metric}_sum {summary['sum']:.6f}")
+            lines.append(f"{metric}_count {summary['count']}")
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def write_atomic(path: str, text: str):
+    """先写临时文件再重命名，读取方不会读到写了一半的文件."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".metrics.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
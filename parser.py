@@ -0,0 +1,74 @@
+import re
+from typing import AsyncIterable, Iterable, Iterator, List, NamedTuple, Optional
+
+from .plugin_log import log
+
+# "1.晴天--周杰伦" / "1、晴天 | 周杰伦"：先匹配序号，剩余部分再按分隔符拆分歌名和歌手
+_NUM_PATTERN = re.compile(r"\s*(\d+)\s*[、.．]")
+# 明确的分隔符：连续两个以上的 -、全角破折号或 |
+_STRONG_SEPARATOR = re.compile(r"-{2,}|—+|\|+")
+
+
+class SongEntry(NamedTuple):
+    """歌曲列表中的一项."""
+    num: str
+    title: str
+    singer: str
+
+
+def parse_line(line: str) -> Optional[SongEntry]:
+    """解析单行歌曲信息，空行或格式不符时返回 None."""
+    num_match = _NUM_PATTERN.match(line)
+    if num_match is None:
+        # 空行以及提示语等不带序号的行直接跳过
+        return None
+    rest = line[num_match.end():]
+    # 按分隔符的明确程度依次尝试，先用子串判断避免无谓的正则搜索
+    if "--" in rest or "|" in rest or "—" in rest:
+        # 明确的分隔符取第一个
+        sep = _STRONG_SEPARATOR.search(rest)
+        start, end = sep.start(), sep.end()
+    elif " - " in rest:
+        # 两侧带空格的 - 取最后一个，"Re-Born - X" 中歌名里的 - 不会被拆分
+        start = rest.rindex(" - ")
+        end = start + 3
+    else:
+        # 兜底：单个 -（与旧版解析一致，取第一个）
+        start = rest.find("-")
+        end = start + 1
+    title = rest[:start].strip() if start != -1 else ""
+    if not title:
+        log.warning("歌名歌手格式异常 | 行内容: {}", line)
+        return None
+    return SongEntry(num_match.group(1), title, rest[end:].strip())
+
+
+def iter_song_list(lines: Iterable[str]) -> Iterator[SongEntry]:
+    for line in lines:
+        entry = parse_line(line)
+        if entry is not None:
+            yield entry
+
+
+def parse_song_list(text: str, max_results: int = 0) -> List[SongEntry]:
+    """解析 TEXT 格式的歌曲列表，max_results 大于0时最多返回该数量."""
+    song_list = []
+    for entry in iter_song_list(text.splitlines()):
+        song_list.append(entry)
+        if len(song_list) == max_results:
+            break
+    return song_list
+
+
+async def parse_song_list_stream(lines: AsyncIterable[bytes], max_results: int = 0,
+                                 encoding: str = "utf-8") -> List[SongEntry]:
+    """逐行读取响应流并解析，达到 max_results 后立即停止读取，不缓存完整响应."""
+    song_list = []
+    async for raw in lines:
+        entry = parse_line(raw.decode(encoding, errors="replace"))
+        if entry is None:
+            continue
+        song_list.append(entry)
+        if len(song_list) == max_results:
+            break
+    return song_list
@@ -0,0 +1,91 @@
+from loguru import logger
+
+# loguru 内置日志级别对应的数值
+LEVELS = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+# 日志中需要脱敏的请求参数
+SECRET_KEYS = frozenset({"key", "api_key"})
+
+
+class Redacted:
+    """延迟脱敏：只有日志真正输出时才生成隐藏了密钥的参数文本."""
+
+    __slots__ = ("params",)
+
+    def __init__(self, params: dict):
+        self.params = params
+
+    def __str__(self) -> str:
+        return str({k: ("***" if k in SECRET_KEYS else v) for k, v in self.params.items()})
+
+
+class Truncated:
+    """延迟截断：只有日志真正输出时才截取文本，避免把完整响应写入日志."""
+
+    __slots__ = ("text", "limit")
+
+    def __init__(self, text, limit: int):
+        self.text = text
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.text)
+        if self.limit <= 0 or len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}...(共{len(text)}字符)"
+
+
+class PluginLogger:
+    """插件日志入口：遵循 log.enabled / log.level 配置，未启用的级别直接返回，不做任何格式化.
+
+    消息使用 loguru 的 "{}" 占位符，参数只在输出时才格式化。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.level = "DEBUG"
+        self.max_body = 512       # 响应内容最多记录的字符数（0=不限制）
+        self._threshold = LEVELS["DEBUG"]
+
+    def configure(self, enabled: bool = True, level: str = "DEBUG", max_body: int = 512):
+        level = str(level).upper()
+        if level not in LEVELS:
+            logger.warning(f"未知的日志级别，使用DEBUG | 配置值: {level}")
+            level = "DEBUG"
+        self.enabled = bool(enabled)
+        self.level = level
+        self.max_body = int(max_body)
+        self._threshold = LEVELS[level]
+
+    def is_enabled(self, level: str) -> bool:
+        return self.enabled and LEVELS[level] >= self._threshold
+
+    def redact(self, params: dict) -> Redacted:
+        return Redacted(params)
+
+    def body(self, text) -> Truncated:
+        return Truncated(text, self.max_body)
+
+    def debug(self, message: str, *args):
+        if self.enabled and self._threshold <= 10:
+            logger.opt(depth=1).debug(message, *args)
+
+    def info(self, message: str, *args):
+        if self.enabled and self._threshold <= 20:
+            logger.opt(depth=1).info(message, *args)
+
+    def warning(self, message: str, *args):
+        if self.enabled and self._threshold <= 30:
+            logger.opt(depth=1).warning(message, *args)
+
+    def error(self, message: str, *args):
+        if self.enabled and self._threshold <= 40:
+            logger.opt(depth=1).error(message, *args)
+
+    def exception(self, message: str, *args):
+        if self.enabled and self._threshold <= 40:
+            logger.opt(depth=1, exception=True).error(message, *args)
+
+
+# 插件内共享的日志实例，由 Music_puls 按配置初始化
+log = PluginLogger()
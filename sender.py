@@ -0,0 +1,192 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .limits import TokenBucket
+from .metrics import Metrics
+from .plugin_log import log
+
+
+class SendDispatcher:
+    """发送队列：消息按会话排队，每个会话由一个协程按入队顺序依次发送.
+
+    所有会话共享一个令牌桶限制总发送速率；发送失败时退避重试。
+    排队中的消息总数达到 max_pending 后，入队方等待队列腾出空间（背压）。
+    """
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics
+        self.enabled = True
+        self.max_pending = 200
+        self.max_retries = 2
+        self.backoff_base = 0.5
+        self.backoff_max = 5.0
+        self.drain_timeout = 5.0
+        self._bucket: Optional[TokenBucket] = None
+        self._chats: "dict[str, deque]" = {}
+        self._workers: "dict[str, asyncio.Task]" = {}
+        self._pending = 0
+        self._space = asyncio.Condition()
+        self._rate_lock = asyncio.Lock()
+        self._closed = False
+        self.sent = 0
+        self.retries = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @staticmethod
+    def parse_config(config: dict) -> dict:
+        """解析并校验配置，不合法时抛出异常且不影响当前设置."""
+        return {
+            "enabled": config.get("enabled", True),
+            "max_pending": max(1, int(config.get("max_pending", 200))),
+            "max_retries": max(0, int(config.get("max_retries", 2))),
+            "backoff_base": float(config.get("backoff_base", 0.5)),
+            "backoff_max": float(config.get("backoff_max", 5)),
+            "drain_timeout": float(config.get("drain_timeout", 5)),
+            "rate": float(config.get("rate", 0)),
+            "burst": max(1.0, float(config.get("burst", 10))),
+        }
+
+    def apply(self, settings: dict):
+        """应用 parse_config 的结果，排队中的消息不受影响."""
+        self.enabled = settings["enabled"]
+        self.max_pending = settings["max_pending"]
+        self.max_retries = settings["max_retries"]
+        self.backoff_base = settings["backoff_base"]
+        self.backoff_max = settings["backoff_max"]
+        self.drain_timeout = settings["drain_timeout"]
+        rate = settings["rate"]
+        # rate <= 0 表示不限速
+        self._bucket = TokenBucket(rate, settings["burst"], time.monotonic()) if rate > 0 else None
+
+    def __len__(self) -> int:
+        return self._pending
+
+    async def put(self, to_wxid: str, func: Callable[..., Awaitable[Any]], *args):
+        """把 func(*args) 加入 to_wxid 的发送队列；未启用队列或已关闭时直接发送."""
+        if self._pending >= self.max_pending and self.enabled and not self._closed:
+            async with self._space:
+                # 被唤醒后在锁内重新检查并占位，多个等待方不会同时超出 max_pending
+                await self._space.wait_for(lambda: self._pending < self.max_pending or self._closed)
+                if not self._closed:
+                    self._pending += 1
+                    self._enqueue(to_wxid, func, args)
+                    return
+        if not self.enabled or self._closed:
+            await self._deliver(to_wxid, func, args, time.perf_counter())
+            return
+        self._pending += 1
+        self._enqueue(to_wxid, func, args)
+
+    def _enqueue(self, to_wxid: str, func: Callable[..., Awaitable[Any]], args: tuple):
+        queue = self._chats.get(to_wxid)
+        if queue is None:
+            queue = self._chats[to_wxid] = deque()
+        queue.append((func, args, time.perf_counter()))
+        if to_wxid not in self._workers:
+            self._workers[to_wxid] = asyncio.create_task(self._drain(to_wxid, queue))
+
+    async def _drain(self, to_wxid: str, queue: deque):
+        try:
+            while queue:
+                func, args, queued_at = queue.popleft()
+                try:
+                    await self._deliver(to_wxid, func, args, queued_at)
+                except asyncio.CancelledError:
+                    self.dropped += 1
+                    raise
+                finally:
+                    self._pending -= 1
+                    async with self._space:
+                        self._space.notify_all()
+        finally:
+            # 队列为空与退出之间没有 await，put 不会把消息放进已退出的队列
+            del self._chats[to_wxid]
+            del self._workers[to_wxid]
+            if queue:
+                # 被取消时仍在排队的消息直接丢弃
+                self._pending -= len(queue)
+                self.dropped += len(queue)
+                log.warning("发送队列关闭，丢弃未发送的消息 | 会话: {} | 数量: {}", to_wxid, len(queue))
+
+    async def _throttle(self):
+        if self._bucket is None:
+            return
+        async with self._rate_lock:
+            delay = self._bucket.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._bucket.take()
+
+    async def _deliver(self, to_wxid: str, func: Callable[..., Awaitable[Any]], args: tuple, queued_at: float):
+        """发送一条消息，失败时按指数退避+随机抖动重试."""
+        if self.metrics is not None:
+            self.metrics.observe("send_queue_wait", time.perf_counter() - queued_at)
+        name = getattr(func, "__name__", "send")
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+            await self._throttle()
+            start = time.perf_counter()
+            try:
+                await func(*args)
+            except Exception as e:
+                log.warning("消息发送失败 | 会话: {} | 方法: {} | 第{}次尝试 | 错误详情: {!r}",
+                            to_wxid, name, attempt + 1, e)
+                continue
+            if self.metrics is not None:
+                self.metrics.observe(name, time.perf_counter() - start)
+            self.sent += 1
+            return
+        self.failures += 1
+        log.error("消息发送失败，已放弃 | 会话: {} | 方法: {} | 重试次数: {}", to_wxid, name, self.max_retries)
+
+    async def close(self):
+        """停止接收新消息，等待 drain_timeout 秒发送剩余消息，超时后取消."""
+        self._closed = True
+        # 等待入队的调用方改为直接发送
+        async with self._space:
+            self._space.notify_all()
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        _, pending = await asyncio.wait(workers, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self.dropped:
+            log.warning("发送队列已关闭 | 共丢弃未发送的消息: {}", self.dropped)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "retries": self.retries,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+class QueuedClient:
+    """WechatAPIClient 包装：发送方法改为加入发送队列后立即返回，其余属性透传."""
+
+    def __init__(self, bot, dispatcher: SendDispatcher):
+        self._bot = bot
+        self._dispatcher = dispatcher
+
+    def __getattr__(self, name: str):
+        return getattr(self._bot, name)
+
+    async def send_text_message(self, wxid: str, content: str, *args):
+        await self._dispatcher.put(wxid, self._bot.send_text_message, wxid, content, *args)
+
+    async def send_at_message(self, wxid: str, content: str, at: list):
+        await self._dispatcher.put(wxid, self._bot.send_at_message, wxid, content, at)
+
+    async def send_app_message(self, wxid: str, xml: str, type_: int):
+        await self._dispatcher.put(wxid, self._bot.send_app_message, wxid, xml, type_)
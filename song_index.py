@@ -0,0 +1,130 @@
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional
+
+
+def normalize_title(text) -> str:
+    """归一化歌名/歌手：全角转半角、忽略大小写，去掉空白和标点."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def ngrams(text: str) -> frozenset:
+    """字符二元组；单个字符的文本以自身作为唯一元素."""
+    if len(text) < 2:
+        return frozenset((text,)) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+
+class IndexMatch(NamedTuple):
+    """索引匹配结果：对应的缓存键 (msg, n) 与相似度."""
+    msg: str
+    n: int
+    score: float
+
+
+class SongIndex:
+    """已获取过的歌曲的本地模糊索引：歌名的字符二元组 → 详情缓存键 (msg, n).
+
+    查询须覆盖歌名的大部分二元组（覆盖率），且查询中的二元组大部分来自歌名和歌手（准确率），
+    两者的较小值作为相似度；只包含歌手或歌名片段的查询不会命中。首条结果的搜索词作为精确别名。
+    条目数超过 max_entries 时淘汰最久未使用的歌曲。
+    """
+
+    # 只对重合二元组最多的若干首歌计算相似度
+    MAX_CANDIDATES = 32
+
+    def __init__(self, max_entries: int = 5000, min_score: float = 0.75):
+        self.max_entries = max(1, int(max_entries))
+        self.min_score = float(min_score)
+        # (msg, n) -> (歌名二元组, 歌名与歌手的全部二元组, 搜索词别名)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._postings: "dict[str, set]" = {}   # 歌名二元组 -> {(msg, n)}
+        self._aliases: "dict[str, tuple]" = {}  # 归一化搜索词 -> (msg, 1)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, msg: str, n: int, data: dict):
+        """索引一条歌曲详情；msg 为归一化后的搜索词."""
+        title = normalize_title(data.get("title") or "")
+        if not title:
+            return
+        singer = normalize_title(data.get("singer") or "")
+        key = (msg, n)
+        self.discard(key)
+        title_grams = ngrams(title)
+        context = title_grams | ngrams(singer) | ngrams(title + singer) | ngrams(singer + title)
+        # 搜索词的首条结果即为这首歌，搜索词本身可作为精确别名
+        alias = normalize_title(msg) if n == 1 else ""
+        self._entries[key] = (title_grams, context, alias)
+        for gram in title_grams:
+            self._postings.setdefault(gram, set()).add(key)
+        if alias:
+            self._aliases[alias] = key
+        while len(self._entries) > self.max_entries:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        title_grams, _, alias = entry
+        for gram in title_grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+        if alias and self._aliases.get(alias) == key:
+            del self._aliases[alias]
+
+    @staticmethod
+    def score(grams: frozenset, title_grams: frozenset, context: frozenset) -> float:
+        """相似度：歌名被查询覆盖的比例与查询落在歌名/歌手中的比例，取较小值."""
+        if not grams:
+            return 0.0
+        coverage = len(grams & title_grams) / len(title_grams)
+        precision = len(grams & context) / len(grams)
+        return min(coverage, precision)
+
+    def search(self, query: str) -> Optional[IndexMatch]:
+        """返回相似度不低于 min_score 的最佳匹配，没有把握时返回 None."""
+        text = normalize_title(query)
+        key = self._aliases.get(text)
+        if key is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return IndexMatch(key[0], key[1], 1.0)
+        grams = ngrams(text)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self._postings.get(gram, ()))
+        best_key, best_score = None, 0.0
+        for key, _ in overlap.most_common(self.MAX_CANDIDATES):
+            title_grams, context, _ = self._entries[key]
+            score = self.score(grams, title_grams, context)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.min_score:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        return IndexMatch(best_key[0], best_key[1], best_score)
+
+    def clear(self):
+        self._entries.clear()
+        self._postings.clear()
+        self._aliases.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "grams": len(self._postings),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
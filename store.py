@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .plugin_log import log
+
+
+# 运行期间清理过期条目的最小间隔（秒）
+PRUNE_INTERVAL = 600
+
+
+class SongStore:
+    """SQLite 持久化的歌曲详情缓存，重启后用于预热内存缓存.
+
+    所有磁盘操作都在工作线程中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str, max_age: float = 86400, warm_limit: int = 5000):
+        self.path = path
+        self.max_age = float(max_age)        # 条目最长保留时间（秒）
+        self.warm_limit = int(warm_limit)    # 启动预热时最多读取的条目数
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()        # sqlite 连接跨线程使用，串行化访问
+        self._closed = False
+        self._pruned_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS songs ("
+                "msg TEXT NOT NULL, n INTEGER NOT NULL, data TEXT NOT NULL, saved_at REAL NOT NULL, "
+                "PRIMARY KEY (msg, n))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_saved_at ON songs (saved_at)")
+        return self._conn
+
+    def _load(self) -> list:
+        with self._lock:
+            conn = self._connect()
+            cutoff = time.time() - self.max_age
+            # 先清理过期条目，再按写入时间倒序读取最新的条目
+            conn.execute("DELETE FROM songs WHERE saved_at < ?", (cutoff,))
+            conn.commit()
+            self._pruned_at = time.time()
+            rows = conn.execute(
+                "SELECT msg, n, data, saved_at FROM songs ORDER BY saved_at DESC LIMIT ?",
+                (self.warm_limit,),
+            ).fetchall()
+        entries = []
+        for msg, n, data, saved_at in rows:
+            try:
+                entries.append((msg, n, json.loads(data), saved_at))
+            except ValueError:
+                log.warning("持久化缓存条目损坏 | 歌曲名: {} | 序号: {}", msg, n)
+        return entries
+
+    def _put(self, msg: str, n: int, data: dict, saved_at: float):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            if self._closed:
+                return
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO songs (msg, n, data, saved_at) VALUES (?, ?, ?, ?)",
+                (msg, n, payload, saved_at),
+            )
+            # 运行期间定期清理过期条目，避免表无限增长
+            if saved_at - self._pruned_at >= PRUNE_INTERVAL:
+                conn.execute("DELETE FROM songs WHERE saved_at < ?", (saved_at - self.max_age,))
+                self._pruned_at = saved_at
+            conn.commit()
+
+    def _close(self):
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def load(self) -> list:
+        """读取未过期的条目，返回 [(msg, n, data, saved_at), ...]."""
+        return await asyncio.to_thread(self._load)
+
+    async def put(self, msg: str, n: int, data: dict):
+        """写入一条歌曲详情（msg 需为归一化后的搜索词）."""
+        await asyncio.to_thread(self._put, msg, n, data, time.time())
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
@@ -0,0 +1,23 @@
+from Music_puls.card import CardRenderer
+
+
+def song(**fields) -> dict:
+    data = {"id": "42", "title": "晴天", "singer": "周杰伦", "link": "https://music.example.com/42",
+            "music_url": "https://cdn.example.com/42.mp3?sign=1", "lyrics": "[00:01.00]故事的小黄花"}
+    data.update(fields)
+    return data
+
+
+def test_render_memo_follows_rendered_fields():
+    cards = CardRenderer({})
+    first = cards.render("摇一摇搜歌", song(), "bot")
+    assert cards.render("摇一摇搜歌", song(), "bot") is first
+    # 同一 id 的播放链接或歌词变化后重新渲染
+    assert "43.mp3" in cards.render("摇一摇搜歌", song(music_url="https://cdn.example.com/43.mp3"), "bot")
+    assert "从出生那年" in cards.render("摇一摇搜歌", song(lyrics="[00:02.00]从出生那年"), "bot")
+
+
+def test_render_memo_ttl_capped_by_detail_ttl():
+    cards = CardRenderer({"cache_ttl": 3600})
+    cards.render("摇一摇搜歌", song(), "bot", ttl=0)
+    assert len(cards._rendered) == 0
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tomllib
+
+import tomli_w
+
+from Music_puls.config_store import ConfigStore
+
+
+def write_config(path, section: dict):
+    with open(path, "wb") as f:
+        tomli_w.dump({"Music_puls": section}, f)
+
+
+def read_section(path) -> dict:
+    with open(path, "rb") as f:
+        return tomllib.load(f)["Music_puls"]
+
+
+def test_flush_keeps_manual_edits(tmp_path):
+    path = tmp_path / "config.toml"
+    write_config(path, {"card_type": "摇一摇搜歌", "log": {"enabled": True}, "max_results": 30})
+
+    async def run():
+        store = ConfigStore(str(path), debounce=0)
+        await store.update(lambda section: section["log"].update(enabled=False))
+        # 写盘前手动编辑配置文件（确保修改时间变化）
+        write_config(path, {"card_type": "摇一摇搜歌", "log": {"enabled": True}, "max_results": 10})
+        os.utime(path, ns=(store.mtime + 10 ** 9, store.mtime + 10 ** 9))
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert read_section(path) == {"card_type": "摇一摇搜歌", "log": {"enabled": False}, "max_results": 10}
+    # 手动编辑尚未应用，保留修改时间差异以便重载
+    assert store.changed()
+
+
+def test_flush_writes_snapshot_when_unchanged(tmp_path):
+    path = tmp_path / "config.toml"
+    write_config(path, {"card_type": "摇一摇搜歌"})
+
+    async def run():
+        store = ConfigStore(str(path), debounce=0)
+        await store.update(lambda section: section.update(card_type="原卡片"))
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert read_section(path) == {"card_type": "原卡片"}
+    assert not store.changed()
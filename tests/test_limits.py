@@ -0,0 +1,28 @@
+import tomllib
+from pathlib import Path
+
+from Music_puls.limits import RateLimiter
+
+CONFIG = Path(__file__).parent.parent / "config.toml"
+
+
+def default_config() -> dict:
+    with open(CONFIG, "rb") as f:
+        return tomllib.load(f)["Music_puls"]
+
+
+def test_default_batch_accepted_for_fresh_user():
+    config = default_config()
+    limiter = RateLimiter(config["limits"])
+    max_count = config["batch"]["max_count"]
+    # 默认配置下 max_count 大于 user_burst，首次批量点歌也应通过
+    assert limiter.acquire("wxid_user", "g1@chatroom", max_count) == 0.0
+    # 额度已用完，紧接着的批量点歌被拒绝
+    assert limiter.acquire("wxid_user", "g1@chatroom", max_count) is None
+
+
+def test_cost_within_burst_is_charged_in_full():
+    limiter = RateLimiter({"user_rate": 0.2, "user_burst": 3, "group_rate": 0, "max_wait": 0})
+    assert limiter.acquire("wxid_user", "g1", 2) == 0.0
+    assert limiter.acquire("wxid_user", "g1", 2) is None
+    assert limiter.acquire("wxid_user", "g1", 1) == 0.0
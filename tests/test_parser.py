@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+
+from Music_puls.parser import SongEntry, parse_line, parse_song_list, parse_song_list_stream
+
+FIXTURE = Path(__file__).parent / "fixtures" / "song_list.txt"
+
+
+def fixture_text() -> str:
+    return FIXTURE.read_text(encoding="utf-8")
+
+
+def test_parse_fixture():
+    assert parse_song_list(fixture_text()) == [
+        SongEntry("1", "晴天", "周杰伦"),
+        SongEntry("2", "Re-Born", "X"),
+        SongEntry("3", "七里香", "周杰伦"),
+        SongEntry("4", "夜曲", "周杰伦"),
+        SongEntry("5", "A-Lin - 给我一个理由忘记", "A-Lin"),
+        SongEntry("6", "稻香", "周杰伦"),
+        SongEntry("8", "Love Story (Taylor's Version)", "Taylor Swift"),
+    ]
+
+
+def test_hyphen_inside_title_is_kept():
+    assert parse_line("2、Re-Born - X") == SongEntry("2", "Re-Born", "X")
+
+
+def test_strong_separators():
+    for line in ("1.晴天--周杰伦", "1.晴天|周杰伦", "1.晴天 || 周杰伦", "1.晴天—周杰伦", "1.晴天 —— 周杰伦"):
+        assert parse_line(line) == SongEntry("1", "晴天", "周杰伦"), line
+
+
+def test_lines_without_number_are_skipped():
+    assert parse_line("请选择歌曲：") is None
+    assert parse_line("") is None
+    assert parse_line("晴天--周杰伦") is None
+
+
+def test_max_results():
+    songs = parse_song_list(fixture_text(), max_results=3)
+    assert [song.num for song in songs] == ["1", "2", "3"]
+
+
+def test_stream_matches_full_parse():
+    data = fixture_text().encode("utf-8")
+
+    async def lines():
+        for line in data.splitlines(keepends=True):
+            yield line
+
+    assert asyncio.run(parse_song_list_stream(lines())) == parse_song_list(fixture_text())
+
+
+def test_stream_stops_after_max_results():
+    data = fixture_text().encode("utf-8").splitlines(keepends=True)
+    consumed = []
+
+    async def lines():
+        for line in data:
+            consumed.append(line)
+            yield line
+
+    songs = asyncio.run(parse_song_list_stream(lines(), max_results=2))
+    assert [song.title for song in songs] == ["晴天", "Re-Born"]
+    # 表头 + 2 行歌曲，之后的内容不再读取
+    assert len(consumed) == 3
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from Music_puls.cache import SearchResultStore
+from Music_puls.parser import parse_song_list
+
+FIXTURE = Path(__file__).parent / "fixtures" / "song_list.txt"
+
+
+def test_resolve_uses_upstream_numbers():
+    # 第7行格式异常被跳过，列表第7项对应接口序号8
+    song_list = parse_song_list(FIXTURE.read_text(encoding="utf-8"))
+    store = SearchResultStore()
+    record = store.put("g1", (("晴天", tuple(int(song.num) for song in song_list)),))
+    assert record.count == 7
+    assert record.resolve(6) == ("晴天", 6)
+    assert record.resolve(7) == ("晴天", 8)
+    assert record.resolve(8) is None
+
+
+def test_resolve_across_batch_segments():
+    record = SearchResultStore().put("g1", (("晴天", (1, 2)), ("稻香", (1, 3, 4))))
+    assert record.count == 5
+    assert record.resolve(2) == ("晴天", 2)
+    assert record.resolve(4) == ("稻香", 3)
+    assert record.resolve(0) is None
@@ -0,0 +1,43 @@
+import pytest
+
+from Music_puls.song_index import SongIndex
+
+
+@pytest.fixture
+def index() -> SongIndex:
+    index = SongIndex()
+    index.add("晴天", 1, {"title": "晴天", "singer": "周杰伦"})
+    index.add("周杰伦", 3, {"title": "七里香", "singer": "周杰伦"})
+    index.add("love story", 1, {"title": "Love Story", "singer": "Taylor Swift"})
+    index.add("理由", 1, {"title": "给我一个理由忘记", "singer": "A-Lin"})
+    return index
+
+
+@pytest.mark.parametrize("query, key", [
+    ("晴天", ("晴天", 1)),
+    ("周杰伦 晴天", ("晴天", 1)),
+    ("七里香", ("周杰伦", 3)),
+    ("七里香 周杰伦", ("周杰伦", 3)),
+    ("LOVE STORY", ("love story", 1)),
+    ("給我一个理由忘记", ("理由", 1)),
+])
+def test_confident_matches(index, query, key):
+    match = index.search(query)
+    assert match is not None and (match.msg, match.n) == key
+
+
+@pytest.mark.parametrize("query", ["周杰伦", "taylor swift", "七里", "里香", "晴天娃娃", "周杰伦的歌"])
+def test_partial_queries_do_not_match(index, query):
+    assert index.search(query) is None
+
+
+def test_eviction_and_discard():
+    index = SongIndex(max_entries=2)
+    index.add("晴天", 1, {"title": "晴天", "singer": "周杰伦"})
+    index.add("稻香", 1, {"title": "稻香", "singer": "周杰伦"})
+    index.add("夜曲", 1, {"title": "夜曲", "singer": "周杰伦"})
+    assert len(index) == 2
+    assert index.search("晴天") is None
+    index.discard(("稻香", 1))
+    assert index.search("稻香") is None
+    assert index.search("夜曲") is not None